@@ -0,0 +1,189 @@
+"""Generate synthetic MkDocs projects embedding Redoc
+
+    python benchmarks/generate.py /tmp/site --pages 1000 --embed-ratio 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+
+import yaml
+
+REMOTE_SPEC_URL = "https://example.invalid/specs/spec-{index}.json"
+
+
+def generate_spec(paths, index=0):
+    """Return an OpenAPI spec with the given number of paths"""
+
+    spec = {
+        "openapi": "3.0.3",
+        "info": {"title": f"Synthetic API {index}", "version": "1.0.0"},
+        "paths": {},
+        "components": {
+            "schemas": {
+                "Item": {
+                    "type": "object",
+                    "required": ["id", "name"],
+                    "properties": {
+                        "id": {"type": "integer", "format": "int64"},
+                        "name": {"type": "string"},
+                        "tags": {"type": "array", "items": {"type": "string"}},
+                    },
+                },
+                "Error": {
+                    "type": "object",
+                    "properties": {
+                        "code": {"type": "integer"},
+                        "message": {"type": "string"},
+                    },
+                },
+            }
+        },
+    }
+    for ind in range(paths):
+        spec["paths"][f"/resource-{ind}/{{item_id}}"] = {
+            "get": {
+                "operationId": f"getResource{ind}",
+                "tags": [f"tag-{ind % 10}"],
+                "summary": f"Get resource {ind}",
+                "parameters": [
+                    {
+                        "name": "item_id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "integer"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Item",
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/Item"}
+                            }
+                        },
+                    },
+                    "default": {
+                        "description": "Error",
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/Error"}
+                            }
+                        },
+                    },
+                },
+            }
+        }
+    return spec
+
+
+def generate_page(index, paragraphs, srcs):
+    """Return markdown of a page with the given redoc tag srcs"""
+
+    lines = [f"# Page {index}", ""]
+    for ind in range(paragraphs):
+        lines.append(
+            f"Paragraph {ind} of page {index}. "
+            "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do "
+            "eiusmod tempor incididunt ut labore et dolore magna aliqua."
+        )
+        lines.append("")
+    for src in srcs:
+        lines.append(f'<redoc src="{src}"/>')
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_project(
+    path,
+    pages=100,
+    embed_ratio=0.2,
+    tags_per_page=1,
+    paragraphs=20,
+    specs=10,
+    spec_paths=50,
+    remote_ratio=0.0,
+    theme="mkdocs",
+    plugin_config=None,
+    seed=0,
+):
+    """Write a MkDocs project into path and return its config file path
+
+    embed_ratio of the pages have tags_per_page redoc tags, each pointing to
+    one of the local specs, or to a remote style url for remote_ratio of them.
+    Remote urls are never fetched unless prefetch_remote is enabled.
+    """
+
+    rng = random.Random(seed)
+    docs_dir = os.path.join(path, "docs")
+    spec_dir = os.path.join(docs_dir, "specs")
+    os.makedirs(spec_dir, exist_ok=True)
+
+    for ind in range(specs):
+        with open(os.path.join(spec_dir, f"spec-{ind}.yaml"), "w", encoding="utf8") as f:
+            yaml.safe_dump(generate_spec(spec_paths, ind), f, sort_keys=False)
+
+    with open(os.path.join(docs_dir, "index.md"), "w", encoding="utf8") as f:
+        f.write("# Synthetic site\n")
+
+    for ind in range(pages):
+        # spread pages across directories like a real site
+        page_dir = os.path.join(docs_dir, f"section-{ind % 20}")
+        os.makedirs(page_dir, exist_ok=True)
+        srcs = []
+        if rng.random() < embed_ratio:
+            for _ in range(tags_per_page):
+                spec_ind = rng.randrange(specs)
+                if rng.random() < remote_ratio:
+                    srcs.append(REMOTE_SPEC_URL.format(index=spec_ind))
+                else:
+                    srcs.append(f"../specs/spec-{spec_ind}.yaml")
+        with open(os.path.join(page_dir, f"page-{ind}.md"), "w", encoding="utf8") as f:
+            f.write(generate_page(ind, paragraphs, srcs))
+
+    config = {
+        "site_name": "Synthetic site",
+        "use_directory_urls": True,
+        "theme": {"name": theme},
+        "plugins": [{"redoc-tag": plugin_config or {}}],
+    }
+    config_file_path = os.path.join(path, "mkdocs.yml")
+    with open(config_file_path, "w", encoding="utf8") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return config_file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--embed-ratio", type=float, default=0.2)
+    parser.add_argument("--tags-per-page", type=int, default=1)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--specs", type=int, default=10)
+    parser.add_argument("--spec-paths", type=int, default=50)
+    parser.add_argument("--remote-ratio", type=float, default=0.0)
+    parser.add_argument("--theme", default="mkdocs")
+    parser.add_argument(
+        "--plugin-config", type=json.loads, default={}, help="redoc-tag options as JSON"
+    )
+    args = parser.parse_args()
+    print(
+        generate_project(
+            args.path,
+            pages=args.pages,
+            embed_ratio=args.embed_ratio,
+            tags_per_page=args.tags_per_page,
+            paragraphs=args.paragraphs,
+            specs=args.specs,
+            spec_paths=args.spec_paths,
+            remote_ratio=args.remote_ratio,
+            theme=args.theme,
+            plugin_config=args.plugin_config,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark mkdocs build of synthetic sites and compare with stored baselines
+
+    python benchmarks/run.py                      # quick scenarios
+    python benchmarks/run.py --scenario pages-10000
+    python benchmarks/run.py --save               # update baselines.json
+
+Each build runs in a fresh interpreter, offline, with the plugin profile
+enabled to measure the share of the build time spent in the plugin.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+from generate import generate_project
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# options of generate_project, the slow scenarios are only run when selected
+SCENARIOS = {
+    "pages-100": {"pages": 100},
+    "pages-1000": {"pages": 1000},
+    "pages-10000": {"pages": 10000, "quick": False},
+    "dense-embeds": {"pages": 200, "embed_ratio": 1.0, "tags_per_page": 5},
+    "large-pages": {"pages": 200, "paragraphs": 500},
+    "large-specs": {"pages": 100, "spec_paths": 2000},
+    "remote-specs": {"pages": 500, "remote_ratio": 1.0},
+    "bundle-specs": {
+        "pages": 500,
+        "spec_paths": 500,
+        "plugin_config": {"bundle_specs": True, "cache": False},
+    },
+}
+
+# differences below these are noise whatever the threshold
+MIN_DELTAS = {"wall_seconds": 0.2, "plugin_seconds": 0.05, "max_rss_mb": 5}
+
+
+# runs in the child interpreter, so memory of the runner doesn't count
+BUILD_SCRIPT = """
+import json, resource, sys, time
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+
+start = time.perf_counter()
+build(load_config(sys.argv[1]))
+wall = time.perf_counter() - start
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# kilobytes on Linux, bytes on macOS
+max_rss_mb = max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps({"wall_seconds": wall, "max_rss_mb": max_rss_mb}))
+"""
+
+
+def run_build(config_file_path):
+    result = subprocess.run(
+        [sys.executable, "-c", BUILD_SCRIPT, config_file_path],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_scenario(name, repeat):
+    """Build a scenario repeat times, keep the fastest run"""
+
+    options = dict(SCENARIOS[name])
+    options.pop("quick", None)
+    plugin_config = dict(options.pop("plugin_config", {}))
+    plugin_config.update({"profile": True, "profile_report": "profile.json"})
+
+    with tempfile.TemporaryDirectory(prefix=f"redoc-bench-{name}-") as path:
+        config_file_path = generate_project(path, plugin_config=plugin_config, **options)
+        best = None
+        for _ in range(repeat):
+            result = run_build(config_file_path)
+            with open(os.path.join(path, "profile.json"), encoding="utf8") as f:
+                profile = json.load(f)
+            result["plugin_seconds"] = profile["total_seconds"]
+            result["plugin_share"] = profile["total_seconds"] / result["wall_seconds"]
+            if best is None or result["wall_seconds"] < best["wall_seconds"]:
+                best = result
+    return best
+
+
+def compare(name, result, baseline, threshold):
+    """Return the regressions of a result over its baseline"""
+
+    regressions = []
+    for key, min_delta in MIN_DELTAS.items():
+        if not baseline.get(key):
+            continue
+        if result[key] > max(baseline[key] * (1 + threshold), baseline[key] + min_delta):
+            regressions.append(
+                f"{name} {key}: {result[key]:.2f} > baseline {baseline[key]:.2f}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="scenario to run, may be repeated, all quick ones by default",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative slowdown reported as a regression",
+    )
+    parser.add_argument("--save", action="store_true", help="store results as baselines")
+    args = parser.parse_args()
+
+    names = args.scenario or [
+        name for name, options in SCENARIOS.items() if options.get("quick", True)
+    ]
+    try:
+        with open(BASELINES_PATH, encoding="utf8") as f:
+            baselines = json.load(f)
+    except OSError:
+        baselines = {"scenarios": {}}
+
+    print(f"{'scenario':<16}{'wall s':>10}{'plugin s':>10}{'share':>8}{'rss MB':>10}")
+    regressions = []
+    for name in names:
+        result = run_scenario(name, args.repeat)
+        print(
+            f"{name:<16}{result['wall_seconds']:>10.2f}{result['plugin_seconds']:>10.2f}"
+            f"{result['plugin_share']:>8.0%}{result['max_rss_mb']:>10.1f}"
+        )
+        baseline = baselines["scenarios"].get(name)
+        if baseline:
+            regressions.extend(compare(name, result, baseline, args.threshold))
+        if args.save:
+            baselines["scenarios"][name] = {
+                key: round(val, 3) for key, val in result.items()
+            }
+
+    if args.save:
+        # numbers only compare on similar machines
+        baselines["machine"] = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+            "cpus": os.cpu_count(),
+        }
+        with open(BASELINES_PATH, "w", encoding="utf8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions and not args.save else 0)
+
+
+if __name__ == "__main__":
+    main()
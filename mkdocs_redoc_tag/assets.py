@@ -0,0 +1,316 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote as urlunquote
+
+from mkdocs.exceptions import PluginError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# kept in the cache directory, out of the deployed site_dir
+MANIFEST_DIR = "manifests"
+# ioctl cloning a file on copy-on-write filesystems e.g. btrfs, xfs
+FICLONE = 0x40049409
+
+COPY_MODES = ("copy", "hardlink", "reflink")
+# hex characters of the content digest in fingerprinted asset names
+FINGERPRINT_LENGTH = 8
+
+# digests of source files shared by every build of the process
+digest_cache = {}
+
+
+def file_digest(path):
+    """Return sha256 hex digest of a file content"""
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def source_digest(path):
+    """Return digest of a source file, reused until the file changes"""
+
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in digest_cache:
+        digest_cache[key] = file_digest(path)
+    return digest_cache[key]
+
+
+def fingerprint_path(path, digest):
+    """Insert the first characters of a digest before the file extension"""
+
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def manifest_path(cache_dir, site_dir):
+    """Path of the manifest of the builds into site_dir"""
+
+    name = hashlib.sha256(os.path.abspath(site_dir).encode("utf8")).hexdigest()[:16]
+    return os.path.join(cache_dir, MANIFEST_DIR, f"{name}.json")
+
+
+def load_manifest(path):
+    """Load the manifest of the previous build, empty if missing or invalid"""
+
+    try:
+        with open(path, encoding="utf8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(path, manifest):
+    """Save the manifest for the next build"""
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    except OSError as e:
+        log.warning(f"Can't write Redoc manifest to '{path}': {e}")
+
+
+def is_up_to_date(dest_path, entry, digest):
+    """Check the output still is the file recorded in the manifest"""
+
+    if not entry or entry.get("sha256") != digest:
+        return False
+    try:
+        stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get(
+        "mtime_ns"
+    )
+
+
+def install_file(src_path, dest_path, mode="copy"):
+    """Copy, hardlink or reflink a file
+    Fall back to copy when the filesystem does not support linking
+    """
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    if os.path.lexists(dest_path):
+        # never write through a hardlink created by a previous build
+        os.remove(dest_path)
+
+    if mode == "hardlink":
+        try:
+            os.link(src_path, dest_path)
+            return
+        except OSError as e:
+            log.debug(f"Hardlink '{dest_path}' failed, fallback to copy: {e}")
+    elif mode == "reflink" and fcntl is not None:
+        try:
+            with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+                fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+            return
+        except OSError as e:
+            os.remove(dest_path)
+            log.debug(f"Reflink '{dest_path}' failed, fallback to copy: {e}")
+
+    shutil.copyfile(src_path, dest_path)
+
+
+def sync_assets(assets, site_dir, manifest, mode="copy"):
+    """Install assets into site_dir, skipping the ones unchanged since last build
+    assets is a list of (source path, output path relative to site_dir)
+    Assets installed by a previous build and not listed anymore, e.g. with an
+    outdated fingerprint, are removed
+    Return the output paths which have been written
+    """
+
+    entries = manifest.setdefault("assets", {})
+    written = []
+    for src_path, dest_rel in assets:
+        dest_path = os.path.join(site_dir, dest_rel)
+        digest = source_digest(src_path)
+        if is_up_to_date(dest_path, entries.get(dest_rel), digest):
+            continue
+
+        install_file(src_path, dest_path, mode)
+        for compressed_path in compressed_paths(dest_path):
+            # a linked file keeps the source mtime, drop outdated compressed files
+            if os.path.exists(compressed_path):
+                os.remove(compressed_path)
+        if file_digest(dest_path) != digest:
+            os.remove(dest_path)
+            entries.pop(dest_rel, None)
+            raise PluginError(
+                f"Redoc asset '{dest_rel}' is corrupted after copy from '{src_path}'"
+            )
+
+        stat = os.stat(dest_path)
+        entries[dest_rel] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        written.append(dest_rel)
+
+    dest_rels = {dest_rel for _, dest_rel in assets}
+    stale = sorted(set(entries) - dest_rels)
+    remove_outputs(site_dir, stale)
+    for dest_rel in stale:
+        del entries[dest_rel]
+    return written
+
+
+def compressed_paths(path):
+    """Return the precompressed siblings of a file"""
+
+    paths = [path + ".gz"]
+    if brotli is not None:
+        paths.append(path + ".br")
+    return paths
+
+
+def is_compress_stale(path):
+    """Check whether a precompressed sibling is missing or older than the file"""
+
+    mtime = os.stat(path).st_mtime_ns
+    for compressed_path in compressed_paths(path):
+        try:
+            if os.stat(compressed_path).st_mtime_ns < mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def compress_file(path):
+    """Write gzip, and brotli when available, siblings of a file"""
+
+    with open(path, "rb") as f:
+        data = f.read()
+    # fixed mtime in the gzip header keeps the output reproducible
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data))
+    return path
+
+
+def compress_files(paths, max_workers=None):
+    """Precompress the files whose content changed since they were compressed
+    zlib and brotli release the GIL, so a thread pool uses every core
+    Return the compressed paths
+    """
+
+    stale_paths = [path for path in paths if is_compress_stale(path)]
+    if not stale_paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(compress_file, stale_paths))
+
+
+def write_file(path, content):
+    """Write text as utf8 or bytes, return the number of bytes written"""
+
+    data = content.encode("utf8") if isinstance(content, str) else content
+    with open(path, "wb") as f:
+        return f.write(data)
+
+
+class OutputWriter:
+    """Generated files written on a thread pool instead of one by one
+
+    Files are kept in memory until flush, or until their total size exceeds
+    max_pending bytes. Each url is written once, later duplicates are ignored.
+    Files named after their content which a previous build has written are
+    only written again when they are missing. The bytes of each file actually
+    written are kept in written_sizes.
+    """
+
+    def __init__(
+        self, site_dir, max_workers=None, max_pending=64 * 1024 * 1024, written=()
+    ):
+        self.site_dir = site_dir
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.written = set(written)
+        self.urls = set()
+        self.written_sizes = {}
+        self.pending = {}
+        self.pending_size = 0
+
+    def add(self, url, content, content_addressed=False):
+        if url in self.urls:
+            return
+        self.urls.add(url)
+        if content_addressed and url in self.written and os.path.isfile(self.path(url)):
+            return
+        self.pending[url] = content
+        self.pending_size += len(content)
+        if self.pending_size > self.max_pending:
+            self.flush()
+
+    def path(self, url):
+        return os.path.join(self.site_dir, urlunquote(url))
+
+    def flush(self):
+        """Write pending files, fail if any of them can't be written"""
+
+        pending, self.pending, self.pending_size = self.pending, {}, 0
+        if not pending:
+            return
+        for dir_path in sorted({os.path.dirname(self.path(url)) for url in pending}):
+            try:
+                os.makedirs(dir_path, exist_ok=True)
+            except OSError as e:
+                raise PluginError(f"Can't create Redoc directory '{dir_path}': {e}")
+
+        def write(item):
+            url, content = item
+            try:
+                self.written_sizes[url] = write_file(self.path(url), content)
+            except OSError as e:
+                return f"'{url}': {e.strerror}"
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            errors = [error for error in executor.map(write, pending.items()) if error]
+        if errors:
+            raise PluginError(
+                f"Can't write {len(errors)} Redoc files: {', '.join(errors)}"
+            )
+
+
+def remove_outputs(site_dir, urls):
+    """Remove generated files, and their precompressed siblings, from site_dir
+    Return the urls which have been removed
+    """
+
+    removed = []
+    for url in urls:
+        path = os.path.join(site_dir, urlunquote(url))
+        for output_path in [path, *compressed_paths(path)]:
+            try:
+                os.remove(output_path)
+            except FileNotFoundError:
+                continue
+            if output_path == path:
+                removed.append(url)
+    return removed
@@ -0,0 +1,91 @@
+def page_payload(embeds, bundle_urls, size):
+    """Bytes a page makes the reader download for its Redoc embeds
+
+    embeds are the documents and specs of each redoc tag of the page, size
+    returns the bytes of a url of the site, None if unknown e.g. remote. Each
+    url is counted once per page, as it is downloaded once. An embed with a
+    spec_size has its spec embedded into the page, or into its document.
+    """
+
+    documents = sorted({embed["document"] for embed in embeds if embed["document"]})
+    specs = sorted(
+        {
+            embed["spec"]
+            for embed in embeds
+            if embed["spec"] and embed["spec_size"] is None
+        }
+    )
+    embedded_specs = {}
+    for embed in embeds:
+        if embed["spec"] and embed["spec_size"] is not None:
+            embedded_specs[embed["spec"]] = max(
+                embedded_specs.get(embed["spec"], 0), embed["spec_size"]
+            )
+    sizes = {url: size(url) for url in [*bundle_urls, *documents, *specs]}
+    payload = {
+        "embeds": len(embeds),
+        "bundle_bytes": sum(sizes[url] or 0 for url in bundle_urls),
+        "document_bytes": sum(sizes[url] or 0 for url in documents),
+        # specs embedded into documents are counted with the documents
+        "spec_bytes": sum(sizes[url] or 0 for url in specs)
+        + sum(embed["spec_size"] or 0 for embed in embeds if not embed["document"]),
+        "specs": {url: sizes[url] for url in specs},
+        "embedded_specs": embedded_specs,
+        "unknown": sorted(url for url, val in sizes.items() if val is None),
+    }
+    payload["total_bytes"] = (
+        payload["bundle_bytes"] + payload["document_bytes"] + payload["spec_bytes"]
+    )
+    return payload
+
+
+def payload_report(pages, bundle_urls, size):
+    """Payload of each page, with the specs and the pages loading them
+    An embedded spec is reported with its largest size, as filters may differ
+    """
+
+    report = {"pages": {}, "specs": {}, "embedded_specs": {}}
+    for src_uri in sorted(pages):
+        payload = page_payload(pages[src_uri], bundle_urls, size)
+        report["pages"][src_uri] = payload
+        for url, spec_size in payload["specs"].items():
+            spec = report["specs"].setdefault(url, {"bytes": spec_size, "pages": []})
+            spec["pages"].append(src_uri)
+        for url, spec_size in payload["embedded_specs"].items():
+            spec = report["embedded_specs"].setdefault(url, {"bytes": 0, "pages": []})
+            spec["bytes"] = max(spec["bytes"], spec_size)
+            spec["pages"].append(src_uri)
+    return report
+
+
+def check_budgets(report, max_embeds=0, max_page_size=0, max_spec_size=0):
+    """Return a message for each page or spec over its budget, 0 is no budget
+    Sizes are in kilobytes
+    """
+
+    messages = []
+    for src_uri, payload in report["pages"].items():
+        if max_embeds and payload["embeds"] > max_embeds:
+            messages.append(
+                f"Page '{src_uri}' has {payload['embeds']} Redoc embeds, "
+                f"over the budget of {max_embeds}"
+            )
+        if max_page_size and payload["total_bytes"] > max_page_size * 1024:
+            messages.append(
+                f"Page '{src_uri}' loads {payload['total_bytes'] / 1024:.0f} KB of "
+                f"Redoc, over the budget of {max_page_size} KB"
+            )
+    for url, spec in report["specs"].items():
+        if max_spec_size and (spec["bytes"] or 0) > max_spec_size * 1024:
+            messages.append(
+                f"Redoc spec '{url}' is {spec['bytes'] / 1024:.0f} KB, over the "
+                f"budget of {max_spec_size} KB, loaded by {', '.join(spec['pages'])}"
+            )
+    for url, spec in report["embedded_specs"].items():
+        if max_spec_size and spec["bytes"] > max_spec_size * 1024:
+            messages.append(
+                f"Redoc spec '{url}' is {spec['bytes'] / 1024:.0f} KB embedded, over "
+                f"the budget of {max_spec_size} KB, embedded by "
+                f"{', '.join(spec['pages'])}"
+            )
+    return messages
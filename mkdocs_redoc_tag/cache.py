@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+
+from mkdocs_redoc_tag.assets import source_digest
+
+log = logging.getLogger(__name__)
+
+# bump when the processing of specs changes, invalidating every cached spec
+CACHE_VERSION = "2"
+# responses of remote specs, bounded by the same max size as processed specs
+REMOTE_DIR = "remote"
+
+
+def path_digest(path):
+    return hashlib.sha256(path.encode("utf8")).hexdigest()
+
+
+def write_atomic(path, content):
+    """Write a file so readers never see it partially written"""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class SpecCache:
+    """Processed specs persisted across builds
+
+    A spec is stored under a key hashed from the content of the spec and of
+    every file it references, so editing any of them is a miss. The files a
+    spec references are recorded in an index entry named after its path and
+    processing options, as the files read depend on how it is processed.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def index_path(self, path, options=""):
+        name = path_digest(f"{path}\n{options}" if options else path)
+        return os.path.join(self.cache_dir, "index", f"{name}.json")
+
+    def spec_path(self, key):
+        return os.path.join(self.cache_dir, "specs", f"{key}.json")
+
+    def key(self, files, options=""):
+        """Hash the content of every file a spec has been processed from"""
+
+        sha = hashlib.sha256(f"{CACHE_VERSION}\n{options}\n".encode())
+        for path in sorted(files):
+            sha.update(f"{path}\n{source_digest(path)}\n".encode())
+        return sha.hexdigest()
+
+    def get_files(self, path, options=""):
+        """Return the files a spec has been processed from by a previous build"""
+
+        try:
+            with open(self.index_path(path, options), encoding="utf8") as f:
+                return json.load(f)["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def get(self, path, options=""):
+        """Return processed spec, None if missing or any of its files changed"""
+
+        files = self.get_files(path, options)
+        if not files:
+            return None
+        try:
+            spec_path = self.spec_path(self.key(files, options))
+            with open(spec_path, encoding="utf8") as f:
+                content = f.read()
+            # keep recently used specs from eviction
+            os.utime(spec_path)
+        except OSError:
+            return None
+        return content
+
+    def set(self, path, files, content, options=""):
+        """Store a processed spec with the files it has been processed from
+        Nothing is stored when any of the files can't be read, e.g. a missing
+        referenced file
+        """
+
+        try:
+            key = self.key(files, options)
+        except OSError:
+            return
+        try:
+            write_atomic(self.spec_path(key), content)
+            write_atomic(
+                self.index_path(path, options),
+                json.dumps({"path": path, "files": sorted(files)}),
+            )
+        except OSError as e:
+            log.warning(f"Can't write Redoc spec cache to '{self.cache_dir}': {e}")
+
+    def evict(self):
+        """Remove least recently used specs and remote responses until the
+        cache fits its max size
+        """
+
+        entries = []
+        for name in ("specs", REMOTE_DIR):
+            try:
+                entries += [
+                    entry
+                    for entry in os.scandir(os.path.join(self.cache_dir, name))
+                    if entry.is_file()
+                ]
+            except OSError:
+                pass
+
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        total_size = sum(entry.stat().st_size for entry in entries)
+        evicted = []
+        for entry in entries:
+            if total_size <= self.max_size:
+                break
+            total_size -= entry.stat().st_size
+            os.remove(entry.path)
+            evicted.append(entry.path)
+        return evicted
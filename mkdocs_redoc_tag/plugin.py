@@ -1,20 +1,123 @@
+import hashlib
+import json
 import logging
 import os
-import uuid
+import posixpath
+import re
+from urllib.parse import quote as urlquote
 from urllib.parse import unquote as urlunquote
-from urllib.parse import urlsplit, urlunsplit
+from urllib.parse import urlencode, urlsplit, urlunsplit
 
-from bs4 import BeautifulSoup
 from jinja2 import Environment, FileSystemLoader
 from markdown.util import AMP_SUBSTITUTE
+from markupsafe import Markup
 
 from mkdocs import utils
 from mkdocs.config import config_options
 from mkdocs.plugins import BasePlugin
 
+from mkdocs_redoc_tag import (
+    assets,
+    budget,
+    cache,
+    profiler,
+    remote,
+    report,
+    rewriter,
+    spec,
+)
+
 log = logging.getLogger(__name__)
 base_path = os.path.dirname(os.path.abspath(__file__))
 
+REDOC_TAG_RE = re.compile(r"<redoc[\s/>]", re.IGNORECASE)
+# iframe html shared by every page embedding the same Redoc
+IFRAME_DIR = "assets/redoc/"
+# bundled OpenAPI specs
+SPEC_DIR = IFRAME_DIR + "specs/"
+# remote OpenAPI specs vendored into the site
+REMOTE_SPEC_DIR = IFRAME_DIR + "remote/"
+# Redoc html shared by every embed of the viewer mode
+VIEWER_FILENAME = "viewer.html"
+# asset paths mapped to their fingerprinted paths, written with fingerprint_assets
+ASSETS_MANIFEST = "assets/redoc-tag-assets.json"
+# operations of the embedded specs with the page and anchor showing them
+OPERATION_INDEX = IFRAME_DIR + "operations.json"
+# service worker caching Redoc, at the site root to control every page
+SERVICE_WORKER = "redoc-tag-sw.js"
+# redoc tag attributes selecting operations, prefixed with include- or exclude-
+PRUNE_FILTERS = ("tags", "paths", "operations")
+
+# compiled templates shared by every build of the process, e.g. mkdocs serve
+template_cache = {}
+
+
+def load_template(name):
+    """Load a template from the redoc directory
+    The compiled template is reused until the template file changes
+    """
+
+    template_dir = os.path.join(base_path, "redoc")
+    mtime = os.stat(os.path.join(template_dir, name)).st_mtime_ns
+    cached = template_cache.get(name)
+    if cached is None or cached[0] != mtime:
+        env = Environment(
+            autoescape=True, loader=FileSystemLoader(template_dir), auto_reload=False
+        )
+        cached = (mtime, env.get_template(name))
+        template_cache[name] = cached
+    return cached[1]
+
+
+def is_remote(url):
+    """Check whether redoc tag src is an online OpenAPI spec"""
+
+    return urlsplit(url).scheme in ("http", "https")
+
+
+def is_changed(digests, base_dir):
+    """Check whether any of the files changed since their digest was recorded
+    Relative paths are from base_dir
+    """
+
+    for path, digest in digests.items():
+        try:
+            if assets.source_digest(os.path.join(base_dir, path)) != digest:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def site_path(url, base_url):
+    """Resolve a url relative to base_url into a path from the site root
+    Urls of other sites are returned unchanged
+    """
+
+    scheme, netloc, path, _, _ = urlsplit(url)
+    if scheme or netloc or path.startswith("/"):
+        return url
+    return posixpath.normpath(
+        posixpath.join(posixpath.dirname(base_url), urlunquote(path))
+    )
+
+
+def is_same_origin(url):
+    """Check whether url is relative to the site"""
+
+    components = urlsplit(url)
+    return not (components.scheme or components.netloc or url.startswith("/"))
+
+
+def config_path(config, path):
+    """Resolve a path of the plugin options relative to the config file"""
+
+    return os.path.normpath(
+        os.path.join(
+            os.path.dirname(config["config_file_path"] or ""), os.path.expanduser(path)
+        )
+    )
+
 
 class RedocPlugin(BasePlugin):
     """Create Redoc with redoc tag"""
@@ -23,18 +126,154 @@ class RedocPlugin(BasePlugin):
         ("background", config_options.Type(str, default="")),
         ("height", config_options.Type(str, default="80vh")),
         ("dark_scheme_name", config_options.Type(str, default="slate")),
+        (
+            "assets_copy_mode",
+            config_options.Choice(assets.COPY_MODES, default="copy"),
+        ),
+        ("precompress", config_options.Type(bool, default=False)),
+        ("bundle_specs", config_options.Type(bool, default=False)),
+        ("embed_spec_max_size", config_options.Type(int, default=0)),
+        ("cache", config_options.Type(bool, default=True)),
+        ("cache_dir", config_options.Type(str, default=".cache/plugin/redoc-tag")),
+        ("cache_max_size", config_options.Type(int, default=256)),
+        ("prefetch_remote", config_options.Type(bool, default=False)),
+        ("prefetch_workers", config_options.Type(int, default=4)),
+        ("prefetch_timeout", config_options.Type(int, default=30)),
+        ("loading", config_options.Choice(("eager", "lazy"), default="eager")),
+        ("lazy_root_margin", config_options.Type(str, default="200px")),
+        (
+            "embed_mode",
+            config_options.Choice(("iframe", "viewer", "inline"), default="iframe"),
+        ),
+        ("profile", config_options.Type(bool, default=False)),
+        ("profile_slowest", config_options.Type(int, default=10)),
+        ("profile_report", config_options.Type(str, default="")),
+        ("fingerprint_assets", config_options.Type(bool, default=False)),
+        ("service_worker", config_options.Type(bool, default=False)),
+        ("operation_index", config_options.Type(bool, default=False)),
+        ("budget_embeds", config_options.Type(int, default=0)),
+        ("budget_page_size", config_options.Type(int, default=0)),
+        ("budget_spec_size", config_options.Type(int, default=0)),
+        ("budget_report", config_options.Type(str, default="")),
     )
 
+    def __init__(self):
+        super().__init__()
+        # live reload server of mkdocs serve and the spec files it watches
+        self.server = None
+        self.watched = set()
+        # manifest of the previous build, kept in memory by mkdocs serve
+        self.manifest = None
+        self.serving = False
+        self.dirty = False
+
+    def on_startup(self, command, dirty, **kwargs):
+        """Defined to keep the plugin across the builds of mkdocs serve, so the
+        spec files it watches are known from one build to the next
+        """
+
+        self.serving = command == "serve"
+        self.dirty = dirty
+
+    def on_serve(self, server, config, builder, **kwargs):
+        """Watch the files of specs outside docs_dir, which mkdocs doesn't"""
+
+        self.server = server
+        self.watch_spec_files(config)
+        return server
+
+    def on_config(self, config, **kwargs):
+        """Set up the cache of processed specs and the profiler"""
+
+        self.profiler = profiler.Profiler(self.config["profile"])
+        self.config_dir = os.path.abspath(
+            os.path.dirname(config["config_file_path"] or "")
+        )
+        self.spec_cache = None
+        self.manifest_path = None
+        if self.config["cache"]:
+            self.spec_cache = cache.SpecCache(
+                config_path(config, self.config["cache_dir"]),
+                self.config["cache_max_size"] * 1024 * 1024,
+            )
+            self.manifest_path = assets.manifest_path(
+                self.spec_cache.cache_dir, config["site_dir"]
+            )
+        return config
+
+    @profiler.timed("on_pre_build")
+    def on_pre_build(self, config, **kwargs):
+        """Load iframe template once for the whole build
+        Reset files generated by the previous build
+        Start the pool prefetching remote specs if enabled
+        """
+
+        self.template = load_template("redoc.html")
+        self.assets = self.find_assets()
+        if self.manifest is None:
+            self.manifest = {}
+            if self.manifest_path is not None:
+                self.manifest = assets.load_manifest(self.manifest_path)
+        # the files of specs loaded as is are only read when a later build
+        # renders pages again on their change
+        self.track_specs = self.serving or self.keep_manifest()
+        self.writer = assets.OutputWriter(
+            config["site_dir"], written=self.manifest.get("outputs", [])
+        )
+        self.built_pages = {}
+        self.spec_files = {}
+        self.processed_specs = {}
+        self.indexed_specs = {}
+        self.bundled_specs = {}
+        self.vendored_specs = {}
+        self.fetcher = None
+        if self.config["prefetch_remote"]:
+            self.fetcher = remote.RemoteFetcher(
+                self.spec_cache.cache_dir if self.spec_cache is not None else None,
+                self.config["prefetch_workers"],
+                self.config["prefetch_timeout"],
+            )
+
+    def on_files(self, files, config, **kwargs):
+        """Mark pages whose specs changed since the previous build as modified
+        A dirty build only renders modified pages again
+        """
+
+        self.files = files
+        for src_uri, record in self.manifest.get("pages", {}).items():
+            if not is_changed(record.get("specs", {}), self.config_dir):
+                continue
+            page_file = files.get_file_from_path(src_uri)
+            if page_file is None or page_file.abs_dest_path is None:
+                continue
+            try:
+                os.utime(page_file.abs_dest_path, ns=(0, 0))
+            except OSError:
+                pass
+        return files
+
+    @profiler.timed("on_page_content")
+    def on_page_content(self, html, page, config, files, **kwargs):
+        """Start fetching remote specs while the other pages are rendered"""
+
+        if self.fetcher is not None and REDOC_TAG_RE.search(html):
+            redoc_list = rewriter.scan(html)
+            for redoc_ele in redoc_list:
+                src = redoc_ele.get("src", "")
+                if is_remote(src):
+                    self.fetcher.prefetch(src)
+        return html
+
     def on_pre_page(self, page, config, files, **kwargs):
         """Add files for validate redoc tag src"""
 
         self.files = files
         return page
 
-    def path_to_url(self, page_file, url):
-        """Validate redoc tag src and parse url"""
+    def get_spec_file(self, page_file, url, warn=True):
+        """Validate redoc tag src and find the file it points to"""
 
-        scheme, netloc, path, query, fragment = urlsplit(url)
+        scheme, netloc, path, _, _ = urlsplit(url)
 
         if (
             scheme
@@ -48,7 +287,7 @@ class RedocPlugin(BasePlugin):
             # Ignore URLs unless they are a relative link to a source file.
             # AMP_SUBSTITUTE is used internally by Markdown only for email.
             # No '.' in the last part of a path indicates path does not point to a file.
-            return url
+            return None
 
         # Determine the filepath of the target.
         target_path = os.path.join(
@@ -58,131 +297,902 @@ class RedocPlugin(BasePlugin):
 
         # Validate that the target exists in files collection.
         if target_path not in self.files:
+            if not warn:
+                return None
             log.warning(
                 f"Documentation file '{page_file.src_path}' contains Redoc scr to "
                 f"'{target_path}' which is not found in the documentation files."
             )
+            return None
+
+        return self.files.get_file_from_path(target_path)
+
+    def path_to_url(self, page_file, url, target_file=None):
+        """Validate redoc tag src and parse url"""
+
+        if target_file is None:
+            target_file = self.get_spec_file(page_file, url)
+        if target_file is None:
             return url
 
-        target_file = self.files.get_file_from_path(target_path)
+        scheme, netloc, path, query, fragment = urlsplit(url)
         path = target_file.url_relative_to(page_file)
         components = (scheme, netloc, path, query, fragment)
         return urlunsplit(components)
 
+    def spec_source(self, page, url, embed=True, base_url=IFRAME_DIR, filters=None):
+        """Url of redoc tag src relative to base_url, the iframe html by default
+        Return the url and the spec JSON if the spec is embedded into the html,
+        the url then is the spec file the JSON is made of
+        """
+
+        if filters and is_remote(url):
+            log.warning(
+                f"Redoc spec '{url}' is remote, its operations can't be selected"
+            )
+            filters = None
+
+        if self.fetcher is not None and is_remote(url):
+            vendored_url = self.vendor_spec(url)
+            if vendored_url is None:
+                return url, None
+            self.use_output(page, vendored_url)
+            return utils.get_relative_url(vendored_url, base_url), None
+
+        spec_file = self.get_spec_file(page.file, url)
+        if spec_file is None:
+            return self.rebase_url(page, url, base_url), None
+
+        if not (
+            self.config["bundle_specs"] or self.config["embed_spec_max_size"] or filters
+        ):
+            # Redoc loads the spec and the files it references from the site
+            if self.track_specs:
+                self.use_spec(page, spec_file)
+            self.use_spec_url(page, spec_file.url)
+            return (
+                self.rebase_url(
+                    page, self.path_to_url(page.file, url, spec_file), base_url
+                ),
+                None,
+            )
+
+        content = self.process_spec(spec_file, filters)
+        self.use_spec(page, spec_file)
+        if (
+            content is not None
+            and embed
+            and len(content.encode("utf8")) <= self.config["embed_spec_max_size"]
+        ):
+            return utils.get_relative_url(spec_file.url, base_url), content
+
+        target_url = spec_file.url
+        if content is not None and (self.config["bundle_specs"] or filters):
+            target_url = self.write_spec(spec_file, content)
+            self.use_output(page, target_url)
+        self.use_spec_url(page, target_url)
+        components = urlsplit(url)
+        path = utils.get_relative_url(target_url, base_url)
+        return urlunsplit(("", "", path, components.query, components.fragment)), None
+
+    def process_spec(self, spec_file, filters=None):
+        """Bundle a local spec with the files it references into one minified JSON
+        Keep only the operations selected by filters, if any
+        Reuse the spec processed by a previous build if none of its files changed
+        Return None if it can't be bundled
+        """
+
+        options = spec.dumps(filters) if filters else ""
+        key = (spec_file.abs_src_path, options)
+        if key in self.processed_specs:
+            return self.processed_specs[key]
+
+        content = None
+        if self.spec_cache is not None:
+            content = self.spec_cache.get(spec_file.abs_src_path, options)
+            if content is not None and spec_file.abs_src_path not in self.spec_files:
+                self.spec_files[spec_file.abs_src_path] = self.spec_cache.get_files(
+                    spec_file.abs_src_path, options
+                )
+
+        if content is None:
+            try:
+                bundled, spec_files = self.bundle_spec(spec_file)
+                if filters:
+                    bundled = spec.prune(
+                        bundled, filters.get("include"), filters.get("exclude")
+                    )
+                    if not bundled.get("paths"):
+                        log.warning(
+                            f"Redoc tag selects no operation of '{spec_file.src_path}'"
+                        )
+            except spec.SpecError as e:
+                log.warning(f"Redoc spec '{spec_file.src_path}' can't be bundled: {e}")
+            else:
+                content = spec.dumps(bundled)
+                self.spec_files[spec_file.abs_src_path] = sorted(spec_files)
+                if self.spec_cache is not None:
+                    self.spec_cache.set(
+                        spec_file.abs_src_path, spec_files, content, options
+                    )
+
+        self.processed_specs[key] = content
+        return content
+
+    def spec_operations(self, spec_file, filters=None):
+        """List the operations of a local spec selected by filters
+        Reuse the list of a previous build if none of the spec files changed
+        """
+
+        options = "operations\n" + (spec.dumps(filters) if filters else "")
+        key = (spec_file.abs_src_path, options)
+        if key in self.indexed_specs:
+            return self.indexed_specs[key]
+
+        operations = None
+        if self.spec_cache is not None:
+            content = self.spec_cache.get(spec_file.abs_src_path, options)
+            if content is not None:
+                operations = json.loads(content)
+                if spec_file.abs_src_path not in self.spec_files:
+                    self.spec_files[spec_file.abs_src_path] = (
+                        self.spec_cache.get_files(spec_file.abs_src_path, options)
+                    )
+
+        if operations is None:
+            content = self.process_spec(spec_file, filters)
+            operations = spec.operations(json.loads(content)) if content else []
+            spec_files = self.spec_files.get(spec_file.abs_src_path)
+            if self.spec_cache is not None and content and spec_files:
+                self.spec_cache.set(
+                    spec_file.abs_src_path, spec_files, spec.dumps(operations), options
+                )
+
+        self.indexed_specs[key] = operations
+        return operations
+
+    def index_operations(self, page, redoc_ele, embed_id):
+        """Record the operations of a local spec embedded into the page
+        Each entry links to the embed, and to the operation if it has an id
+        """
+
+        spec_file = self.get_spec_file(page.file, redoc_ele.get("src", ""), warn=False)
+        if spec_file is None:
+            return []
+        operations = self.spec_operations(spec_file, self.prune_filters(redoc_ele))
+        self.use_spec(page, spec_file)
+        # an operation embedded again on the page links to its first embed
+        indexed = self.built_pages[page.file.src_uri]["indexed"]
+        entries = []
+        for operation in operations:
+            key = (spec_file.abs_src_path, operation["method"], operation["path"])
+            if key in indexed:
+                continue
+            indexed.add(key)
+            anchor = embed_id
+            if "operationId" in operation:
+                anchor += "/operation/" + urlquote(operation["operationId"], safe="")
+            entries.append(dict(operation, location=f"{page.url}#{anchor}"))
+        self.built_pages[page.file.src_uri]["operations"].extend(entries)
+        return entries
+
+    def index_search(self, config, entries):
+        """Add operations to the search index, each as its own result"""
+
+        search_entries = self.search_entries(config)
+        if search_entries is None:
+            return
+        for entry in entries:
+            text = " ".join(
+                [entry.get("summary", ""), entry.get("operationId", "")] + entry["tags"]
+            )
+            search_entries.append(
+                {
+                    "location": entry["location"],
+                    "title": f"{entry['method'].upper()} {entry['path']}",
+                    "text": text.strip(),
+                }
+            )
+
+    def search_entries(self, config):
+        """Entries of the index of the search plugin, mkdocs or mkdocs-material
+        None if there is no search plugin
+        """
+
+        for plugin in config["plugins"].values():
+            search_index = getattr(plugin, "search_index", None)
+            entries = getattr(
+                search_index, "entries", getattr(search_index, "_entries", None)
+            )
+            if isinstance(entries, list):
+                return entries
+        return None
+
+    def use_output(self, page, url):
+        """Record a generated file the page refers to"""
+
+        self.built_pages[page.file.src_uri]["outputs"].add(url)
+
+    def use_spec_url(self, page, url):
+        """Record a spec of the site the page loads, url is from the site root"""
+
+        self.built_pages[page.file.src_uri]["spec_urls"].add(url)
+
+    def use_embed(self, page, document, spec_url, spec_size=None):
+        """Record the document and spec loaded by an embed of the page
+        Urls are from the site root, spec_size is the size of a spec embedded
+        into the page or the document
+        """
+
+        self.built_pages[page.file.src_uri]["embeds"].append(
+            {"document": document, "spec": spec_url, "spec_size": spec_size}
+        )
+
+    def use_spec(self, page, spec_file):
+        """Record the files of a spec the page has been built from"""
+
+        self.built_pages[page.file.src_uri]["specs"].update(
+            self.spec_dependencies(spec_file)
+        )
+
+    def spec_dependencies(self, spec_file):
+        """Files of a local spec, itself and the ones it references by $ref
+        Known from bundling it, or from the cache if none of them changed,
+        otherwise read from its references
+        """
+
+        path = spec_file.abs_src_path
+        if self.spec_files.get(path):
+            return self.spec_files[path]
+
+        files = None
+        if self.spec_cache is not None:
+            content = self.spec_cache.get(path, "references")
+            if content is not None:
+                files = json.loads(content)
+        if files is None:
+            files = sorted(spec.references(path))
+            if self.spec_cache is not None:
+                self.spec_cache.set(path, files, json.dumps(files), "references")
+        self.spec_files[path] = files
+        return files
+
+    def bundle_spec(self, spec_file):
+        """Bundle a local spec once per build, whatever the operations selected"""
+
+        if spec_file.abs_src_path not in self.bundled_specs:
+            self.bundled_specs[spec_file.abs_src_path] = spec.bundle(
+                spec_file.abs_src_path
+            )
+        return self.bundled_specs[spec_file.abs_src_path]
+
+    def prune_filters(self, redoc_ele):
+        """Operations selected by the redoc tag attributes
+        e.g. include-tags="pets,store" or exclude-operations="deletePet"
+        """
+
+        filters = {}
+        for mode in ("include", "exclude"):
+            values = {
+                name: [
+                    val.strip()
+                    for val in redoc_ele.get(f"{mode}-{name}", "").split(",")
+                    if val.strip()
+                ]
+                for name in PRUNE_FILTERS
+            }
+            if any(values.values()):
+                filters[mode] = values
+        return filters
+
+    def vendor_spec(self, url):
+        """Write a prefetched remote spec into the site and return its url
+        A spec with relative $ref is bundled with the documents they point to,
+        fetched against its url, as they aren't in the site
+        Return None if it can't be fetched or bundled
+        """
+
+        if url in self.vendored_specs:
+            return self.vendored_specs[url]
+
+        self.vendored_specs[url] = None
+        content = self.fetcher.get(url)
+        if content is None:
+            return None
+        stem, ext = os.path.splitext(posixpath.basename(urlsplit(url).path))
+        try:
+            bundled = spec.bundle_remote(url, content, self.fetcher.get)
+        except spec.SpecError as e:
+            log.warning(
+                f"Redoc spec '{url}' can't be bundled, loaded from its url: {e}"
+            )
+            return None
+        if bundled is not None:
+            content, ext = spec.dumps(bundled).encode("utf8"), ".json"
+
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        vendored_url = f"{REMOTE_SPEC_DIR}{stem or 'spec'}-{digest}{ext}"
+        self.writer.add(vendored_url, content, content_addressed=True)
+        self.vendored_specs[url] = vendored_url
+        return vendored_url
+
+    def write_spec(self, spec_file, content):
+        """Write a bundled spec named after its content and return its url"""
+
+        digest = hashlib.sha256(content.encode("utf8")).hexdigest()[:16]
+        stem = os.path.splitext(os.path.basename(spec_file.src_path))[0]
+        spec_url = f"{SPEC_DIR}{stem}-{digest}.json"
+        self.writer.add(spec_url, content, content_addressed=True)
+        return spec_url
+
+    @profiler.timed("on_post_page")
     def on_post_page(self, output, page, config, **kwargs):
         """Replace redoc tag with iframe
-        Add javascript code to update iframe height
+        Include the script syncing dark mode and loading lazy or inline Redoc
         Create a html with Redoc for iframe
         """
 
-        soup = BeautifulSoup(output, "html.parser")
-        redoc_list = soup.find_all("redoc")
-        iframe_id_list = []
+        # outputs of the page in the previous build are replaced
+        self.built_pages[page.file.src_uri] = {
+            "outputs": set(),
+            "specs": set(),
+            "spec_urls": set(),
+            "operations": [],
+            "indexed": set(),
+            "embeds": [],
+        }
+        if not self.need_rewrite(output):
+            # Return the page untouched, scanning it for tags is wasted work
+            return output
+
+        self.profiler.count("pages_scanned")
+        with self.profiler.timer("scan"):
+            redoc_list = rewriter.scan(output)
+        if redoc_list:
+            self.profiler.count("pages_rewritten")
+            self.profiler.count("redoc_tags", len(redoc_list))
+        replacements = []
+        # occurrences of each id on the page, identical embeds share a document
+        # but each element needs its own id
+        embed_ids = {}
+
+        for redoc_ele in redoc_list:
+            if self.config["embed_mode"] == "inline":
+                embed_id, replacement = self.build_inline(page, redoc_ele, embed_ids)
+            else:
+                cur_id, iframe_url = self.render_iframe(page, redoc_ele)
+                embed_id = self.unique_id(embed_ids, cur_id)
+                replacement = self.build_iframe(embed_id, iframe_url)
+            replacements.append((redoc_ele.start, redoc_ele.end, replacement))
+            if self.config["operation_index"]:
+                with self.profiler.timer("index_operations"):
+                    self.index_search(
+                        config, self.index_operations(page, redoc_ele, embed_id)
+                    )
+
+        if redoc_list and self.need_script(config):
+            # inside the page content, so mkdocs-material runs it again on
+            # instant navigation to the page
+            position = redoc_list[-1].end
+            replacements.append((position, position, self.build_script(page, config)))
+
+        return rewriter.splice(output, replacements)
+
+    def render_iframe(self, page, redoc_ele):
+        """Create a html with Redoc for iframe, or point iframe to the shared viewer
+        Return iframe id and url relative to the page
+        """
 
-        if len(redoc_list) > 0:
-            css_dir = utils.get_relative_url(
-                utils.normalize_url("assets/stylesheets/"), page.url
+        with self.profiler.timer("spec_source"):
+            openapi_spec_url, openapi_spec_json = self.spec_source(
+                page,
+                redoc_ele.get("src", ""),
+                self.config["embed_mode"] == "iframe",
+                filters=self.prune_filters(redoc_ele),
             )
-            js_dir = utils.get_relative_url(
-                utils.normalize_url("assets/javascripts/"), page.url
+
+        if self.config["embed_mode"] == "viewer" and is_same_origin(openapi_spec_url):
+            # the viewer loads the spec given in its query string
+            query = urlencode({"spec": openapi_spec_url})
+            cur_id = hashlib.sha256(query.encode("utf8")).hexdigest()[:16]
+            viewer_url = utils.get_relative_url(IFRAME_DIR + VIEWER_FILENAME, page.url)
+            self.use_embed(
+                page,
+                IFRAME_DIR + VIEWER_FILENAME,
+                site_path(openapi_spec_url, IFRAME_DIR),
             )
-            env = Environment(autoescape=True, loader=FileSystemLoader(os.path.join(base_path, "redoc")))
-            template = env.get_template("redoc.html")
+            return cur_id, f"{viewer_url}?{query}"
 
-            page_dir = os.path.dirname(
-                os.path.join(config["site_dir"], urlunquote(page.url))
+        spec_size = None
+        if openapi_spec_json is not None:
+            # escape_script makes the JSON unable to close its script element
+            openapi_spec_json = Markup(spec.escape_script(openapi_spec_json))  # nosec B704
+            spec_size = len(openapi_spec_json.encode("utf8"))
+        with self.profiler.timer("render_template"):
+            output_from_parsed_template = self.render_template(
+                openapi_spec_url=openapi_spec_url,
+                openapi_spec_json=openapi_spec_json,
             )
-            if not os.path.exists(page_dir):
-                os.makedirs(page_dir)
+        # identical iframes share one content addressed document
+        cur_id = hashlib.sha256(
+            output_from_parsed_template.encode("utf8")
+        ).hexdigest()[:16]
+        iframe_filename = f"redoc-{cur_id}.html"
+        self.writer.add(
+            IFRAME_DIR + iframe_filename,
+            output_from_parsed_template,
+            content_addressed=True,
+        )
+        self.use_output(page, IFRAME_DIR + iframe_filename)
+        self.use_embed(
+            page,
+            IFRAME_DIR + iframe_filename,
+            site_path(openapi_spec_url, IFRAME_DIR),
+            spec_size,
+        )
+        return cur_id, utils.get_relative_url(IFRAME_DIR + iframe_filename, page.url)
 
-            for redoc_ele in redoc_list:
-                cur_id = str(uuid.uuid4())[:8]
-                iframe_filename = f"redoc-{cur_id}.html"
-                iframe_id_list.append(cur_id)
-
-                openapi_spec_url = self.path_to_url(page.file, redoc_ele.get("src", ""))
-                output_from_parsed_template = template.render(
-                    css_dir=css_dir,
-                    js_dir=js_dir,
-                    background=self.config["background"],
-                    id=cur_id,
-                    openapi_spec_url=openapi_spec_url,
-                )
-                with open(os.path.join(page_dir, iframe_filename), "w") as f:
-                    f.write(output_from_parsed_template)
-                self.replace_with_iframe(soup, redoc_ele, cur_id, iframe_filename)
+    def unique_id(self, embed_ids, cur_id):
+        """Suffix an id already used on the page with its occurrence index"""
+
+        occurrence = embed_ids.get(cur_id, 0)
+        embed_ids[cur_id] = occurrence + 1
+        return f"{cur_id}-{occurrence}" if occurrence else cur_id
 
-        js_code = soup.new_tag("script")
-        js_code.string = ""
+    def build_inline(self, page, redoc_ele, embed_ids):
+        """Create container markup replacing redoc tag
+        Redoc is rendered into the container by the page itself
+        Return container id and markup
+        """
+
+        with self.profiler.timer("spec_source"):
+            openapi_spec_url, openapi_spec_json = self.spec_source(
+                page,
+                redoc_ele.get("src", ""),
+                base_url=page.url,
+                filters=self.prune_filters(redoc_ele),
+            )
+        attrs = {"class": "redoc-inline"}
+        if self.config["background"]:
+            attrs["style"] = f"background: {self.config['background']};"
+
+        if openapi_spec_json is None:
+            cur_id = hashlib.sha256(openapi_spec_url.encode("utf8")).hexdigest()[:16]
+            attrs["id"] = self.unique_id(embed_ids, f"redoc-{cur_id}")
+            attrs["data-spec-url"] = openapi_spec_url
+            self.use_embed(page, None, site_path(openapi_spec_url, page.url))
+            return attrs["id"], rewriter.build_tag("div", attrs)
+
+        cur_id = hashlib.sha256(openapi_spec_json.encode("utf8")).hexdigest()[:16]
+        attrs["id"] = self.unique_id(embed_ids, f"redoc-{cur_id}")
+        attrs["data-spec-id"] = f"redoc-spec-{cur_id}"
+        if attrs["id"] != f"redoc-{cur_id}":
+            # the spec is already on the page, kept next to its first container
+            self.use_embed(page, None, None, 0)
+            return attrs["id"], rewriter.build_tag("div", attrs)
+
+        # Redoc empties its container, the spec is kept next to it
+        spec_tag = rewriter.build_tag(
+            "script",
+            {"type": "application/json", "id": attrs["data-spec-id"]},
+            spec.escape_script(openapi_spec_json),
+        )
+        self.use_embed(
+            page,
+            None,
+            site_path(openapi_spec_url, page.url),
+            len(openapi_spec_json.encode("utf8")),
+        )
+        return attrs["id"], spec_tag + rewriter.build_tag("div", attrs)
+
+    def need_script(self, config):
+        """Check whether pages with redoc tag need the page script"""
+
+        return (
+            config["theme"].name == "material"
+            or self.config["loading"] == "lazy"
+            or self.config["embed_mode"] == "inline"
+            or self.config["service_worker"]
+            or self.config["operation_index"]
+        )
 
+    def build_script(self, page, config):
+        """Create the script element including the page side of the plugin
+        Options are passed as data attributes, so the script is a static asset
+        """
+
+        attrs = {"src": self.asset_url("assets/javascripts/redoc-tag.js", page.url)}
         if config["theme"].name == "material":
             # synchronized dark mode with mkdocs-material
-            js_code.string += f"""
-            const dark_scheme_name = "{self.config['dark_scheme_name']}"
-            """
-            js_code.string += """
-            window.scheme = document.body.getAttribute("data-md-color-scheme")
-            const options = {
-                attributeFilter: ['data-md-color-scheme'],
-            };
-            function color_scheme_callback(mutations) {
-                for (let mutation of mutations) {
-                    if (mutation.attributeName === "data-md-color-scheme") {
-                        scheme = document.body.getAttribute("data-md-color-scheme")
-                        var iframe_list = document.getElementsByClassName("redoc-iframe")
-                        for(var i = 0; i < iframe_list.length; i++) {
-                            var ele = iframe_list.item(i);
-                            if (ele) {
-                                if (scheme === dark_scheme_name) {
-                                    ele.contentWindow.enable_dark_mode();
-                                } else {
-                                    ele.contentWindow.disable_dark_mode();
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-            observer = new MutationObserver(color_scheme_callback);
-            observer.observe(document.body, options);
-            """
-            # support compatible with mkdocs-material Instant loading feature
-            js_code.string = "document$.subscribe(() => {" + js_code.string + "})"
-        soup.body.append(js_code)
-
-        return str(soup)
-
-    def replace_with_iframe(self, soup, redoc_ele, cur_id, iframe_filename):
-        """Replace redoc tag with iframe"""
-        iframe = soup.new_tag("iframe")
-        iframe["id"] = cur_id
-        iframe["src"] = iframe_filename
-        iframe["frameborder"] = "0"
-        iframe["style"] = f"overflow:hidden;width:100%;height:{self.config['height']};"
-        iframe["width"] = "100%"
-        iframe["class"] = "redoc-iframe"
-        redoc_ele.replace_with(iframe)
+            attrs["data-dark-scheme-name"] = self.config["dark_scheme_name"]
+            if self.config["embed_mode"] == "inline":
+                attrs["data-scroll-y-offset"] = ".md-header"
+        if self.config["loading"] == "lazy":
+            attrs["data-root-margin"] = self.config["lazy_root_margin"]
+        if self.config["service_worker"]:
+            attrs["data-service-worker"] = utils.get_relative_url(
+                SERVICE_WORKER, page.url
+            )
+        if self.config["embed_mode"] == "inline" and self.config["fingerprint_assets"]:
+            # fingerprinted names of the Redoc bundle, relative to the script
+            for attr, asset_path in (
+                ("data-redoc-js", "assets/javascripts/redoc.standalone.js"),
+                ("data-redark-js", "assets/javascripts/redark.js"),
+            ):
+                attrs[attr] = posixpath.basename(self.assets[asset_path][1])
+        return rewriter.build_tag("script", attrs)
+
+    def render_template(self, **kwargs):
+        """Render the iframe template for a html in the iframe directory"""
+
+        return self.template.render(
+            redark_css=self.asset_url("assets/stylesheets/redark.css", IFRAME_DIR),
+            redark_js=self.asset_url("assets/javascripts/redark.js", IFRAME_DIR),
+            redoc_js=self.asset_url(
+                "assets/javascripts/redoc.standalone.js", IFRAME_DIR
+            ),
+            background=self.config["background"],
+            dark_scheme_name=self.config["dark_scheme_name"],
+            **kwargs,
+        )
+
+    def rebase_url(self, page, url, base_url):
+        """Make url relative to the page relative to base_url instead"""
+
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        if scheme or netloc or not path or path.startswith("/"):
+            return url
+
+        page_dir = page.url.rpartition("/")[0]
+        target_url = posixpath.normpath(posixpath.join(page_dir, path))
+        path = utils.get_relative_url(target_url, base_url)
+        components = (scheme, netloc, path, query, fragment)
+        return urlunsplit(components)
+
+    def need_rewrite(self, output):
+        """Cheap pre-scan deciding whether the page has to be scanned at all"""
+
+        return REDOC_TAG_RE.search(output) is not None
+
+    def build_iframe(self, cur_id, iframe_filename):
+        """Create iframe markup replacing redoc tag
+        A lazy iframe keeps its src in data-src until it is scrolled into view
+        """
+        attrs = {
+            "id": cur_id,
+            "src": iframe_filename,
+            "frameborder": "0",
+            "style": f"overflow:hidden;width:100%;height:{self.config['height']};",
+            "width": "100%",
+            "class": "redoc-iframe",
+        }
+        if self.config["loading"] == "lazy":
+            attrs["data-src"] = attrs.pop("src")
+            attrs["loading"] = "lazy"
+        return rewriter.build_tag("iframe", attrs)
 
     def on_post_build(self, config, **kwargs):
-        """Copy Redoc css and js files to assets directory"""
+        """Write generated files collected from pages
+        Copy Redoc css and js files to assets directory
+        Files unchanged since the previous build are skipped
+        Precompress assets and generated files if enabled
+        Evict processed specs exceeding the cache size
+        """
+
+        with self.profiler.timer("on_post_build", self.profiler.hooks):
+            self.write_outputs(config)
+            self.watch_spec_files(config)
+        if self.profiler.enabled:
+            self.report_profile(config)
 
-        output_base_path = os.path.join(config["site_dir"], "assets")
-        css_path = os.path.join(output_base_path, "stylesheets")
-        for file_name in os.listdir(os.path.join(base_path, "redoc", "stylesheets")):
-            utils.copy_file(
-                os.path.join(base_path, "redoc", "stylesheets", file_name),
-                os.path.join(css_path, file_name),
+    def write_outputs(self, config):
+        """Write generated files and assets of the build"""
+
+        self.close_fetcher()
+        if self.spec_cache is not None:
+            with self.profiler.timer("evict_cache"):
+                self.spec_cache.evict()
+
+        if self.config["embed_mode"] == "viewer":
+            self.writer.add(IFRAME_DIR + VIEWER_FILENAME, self.render_template(viewer=True))
+        if self.config["operation_index"]:
+            self.writer.add(OPERATION_INDEX, self.render_operation_index())
+        if self.config["service_worker"]:
+            self.writer.add(SERVICE_WORKER, self.render_service_worker())
+        if self.config["fingerprint_assets"]:
+            self.writer.add(
+                ASSETS_MANIFEST,
+                json.dumps(
+                    {path: dest_rel for path, (_, dest_rel) in self.assets.items()},
+                    indent=2,
+                    sort_keys=True,
+                ),
+            )
+        with self.profiler.timer("write_files"):
+            self.writer.flush()
+        site_dir = config["site_dir"]
+        with self.profiler.timer("remove_stale"):
+            removed = self.remove_stale_outputs(site_dir)
+        self.profiler.count("stale_removed", len(removed))
+        with self.profiler.timer("sync_assets"):
+            copied = assets.sync_assets(
+                list(self.assets.values()),
+                site_dir,
+                self.manifest,
+                self.config["assets_copy_mode"],
             )
+            # mkdocs serve builds into a temporary site_dir, its manifest is
+            # only kept in memory
+            if not self.serving and self.keep_manifest():
+                assets.save_manifest(self.manifest_path, self.manifest)
+        self.profiler.count("assets_copied", len(copied))
+        if self.need_budget():
+            with self.profiler.timer("check_budgets"):
+                self.check_budgets(config)
+
+        if self.config["precompress"]:
+            compress_list = [
+                os.path.join(site_dir, dest_rel)
+                for _, dest_rel in self.assets.values()
+            ]
+            compress_list.extend(self.writer.path(url) for url in sorted(self.writer.urls))
+            with self.profiler.timer("precompress"):
+                compressed = assets.compress_files(compress_list)
+            report.log.info(f"Precompressed {len(compressed)} Redoc files")
+
+    def remove_stale_outputs(self, site_dir):
+        """Record the outputs of each page in the manifest
+        Remove generated files no page refers to anymore, e.g. left by a dirty
+        build after editing a page
+        Return the urls which have been removed
+        """
+
+        pages = self.kept_pages()
+        for src_uri, record in self.built_pages.items():
+            if not (
+                record["outputs"]
+                or record["specs"]
+                or record["spec_urls"]
+                or record["operations"]
+            ):
+                continue
+            specs = {}
+            for path in sorted(record["specs"]):
+                try:
+                    digest = assets.source_digest(path)
+                except OSError:
+                    digest = None
+                specs[self.relative_path(path)] = digest
+            pages[src_uri] = {"outputs": sorted(record["outputs"]), "specs": specs}
+            if record["spec_urls"]:
+                pages[src_uri]["spec_urls"] = sorted(record["spec_urls"])
+            if record["operations"]:
+                pages[src_uri]["operations"] = record["operations"]
+
+        referenced = set(self.writer.urls)
+        for record in pages.values():
+            referenced.update(record["outputs"])
+        stale = set(self.manifest.get("outputs", [])) - referenced
+        removed = assets.remove_outputs(site_dir, sorted(stale))
+
+        self.manifest["pages"] = pages
+        self.manifest["outputs"] = sorted(referenced)
+        return removed
+
+    def keep_manifest(self):
+        """Check whether the manifest is saved for the next build
+        Dirty builds use it, otherwise the cache directory isn't created only
+        to keep it
+        """
+
+        return self.manifest_path is not None and (
+            self.dirty or os.path.isdir(self.spec_cache.cache_dir)
+        )
+
+    def relative_path(self, path):
+        """Path from the config directory, so the manifest doesn't hold the
+        layout of the filesystem around the project
+        """
+
+        try:
+            return os.path.relpath(path, self.config_dir)
+        except ValueError:
+            # on another drive
+            return path
+
+    def watch_spec_files(self, config):
+        """Watch the files specs of the site reference outside docs_dir, stop
+        watching the ones no spec references anymore
+        """
+
+        if self.server is None:
+            return
+        docs_dir = os.path.join(os.path.abspath(config["docs_dir"]), "")
+        paths = {
+            os.path.normpath(os.path.join(self.config_dir, path))
+            for record in self.manifest.get("pages", {}).values()
+            for path in record.get("specs", {})
+        }
+        paths = {
+            path
+            for path in paths
+            if not path.startswith(docs_dir) and os.path.isfile(path)
+        }
+        for path in sorted(paths - self.watched):
+            self.server.watch(path, recursive=False)
+        for path in sorted(self.watched - paths):
+            self.server.unwatch(path)
+        self.watched = paths
+
+    def need_budget(self):
+        return bool(
+            self.config["budget_embeds"]
+            or self.config["budget_page_size"]
+            or self.config["budget_spec_size"]
+            or self.config["budget_report"]
+        )
+
+    def check_budgets(self, config):
+        """Report the bytes each page built loads for Redoc, and warn about the
+        pages and specs over budget
+        """
+
+        site_dir = config["site_dir"]
 
-        js_path = os.path.join(output_base_path, "javascripts")
-        for file_name in os.listdir(os.path.join(base_path, "redoc", "javascripts")):
-            utils.copy_file(
-                os.path.join(base_path, "redoc", "javascripts", file_name),
-                os.path.join(js_path, file_name),
+        def size(url):
+            if is_remote(url):
+                return None
+            try:
+                return os.path.getsize(os.path.join(site_dir, url))
+            except OSError:
+                return None
+
+        # Redoc files loaded by a page, once whatever its number of embeds
+        bundle_paths = [
+            "assets/javascripts/redoc.standalone.js",
+            "assets/javascripts/redark.js",
+        ]
+        if self.config["embed_mode"] != "inline":
+            bundle_paths.append("assets/stylesheets/redark.css")
+        if self.need_script(config):
+            bundle_paths.append("assets/javascripts/redoc-tag.js")
+        payloads = budget.payload_report(
+            {
+                src_uri: record["embeds"]
+                for src_uri, record in self.built_pages.items()
+                if record["embeds"]
+            },
+            [self.assets[path][1] for path in bundle_paths],
+            size,
+        )
+        for message in budget.check_budgets(
+            payloads,
+            self.config["budget_embeds"],
+            self.config["budget_page_size"],
+            self.config["budget_spec_size"],
+        ):
+            report.log.warning(message)
+        if self.config["budget_report"]:
+            report.write_report(
+                config_path(config, self.config["budget_report"]), payloads
             )
 
-        for file_name in os.listdir(os.path.join(base_path, "redoc", "javascripts")):
-            utils.copy_file(
-                os.path.join(base_path, "redoc", "javascripts", file_name),
-                os.path.join(js_path, file_name),
+    def kept_pages(self):
+        """Manifest records of the pages a dirty build has not built again"""
+
+        page_uris = {
+            page_file.src_uri for page_file in self.files.documentation_pages()
+        }
+        return {
+            src_uri: record
+            for src_uri, record in self.manifest.get("pages", {}).items()
+            if src_uri in page_uris and src_uri not in self.built_pages
+        }
+
+    def render_operation_index(self):
+        """Dump the operations of every page as JSON
+        Dirty builds keep the operations of the pages not built again
+        """
+
+        pages = {
+            src_uri: record.get("operations", [])
+            for src_uri, record in self.kept_pages().items()
+        }
+        pages.update(
+            (src_uri, record["operations"])
+            for src_uri, record in self.built_pages.items()
+        )
+        return json.dumps(
+            [entry for src_uri in sorted(pages) for entry in pages[src_uri]],
+            separators=(",", ":"),
+        )
+
+    def render_service_worker(self):
+        """Render the service worker with the files emitted by the build
+        Redoc assets and html are precached, specs are revalidated
+        """
+
+        outputs = set(self.writer.urls)
+        spec_urls = set()
+        for record in self.built_pages.values():
+            spec_urls.update(record["spec_urls"])
+        # dirty builds keep the files of the pages not built again
+        for record in self.kept_pages().values():
+            outputs.update(record["outputs"])
+            spec_urls.update(record.get("spec_urls", []))
+        # the cache is replaced when any precached content changes, names of
+        # iframe html already are a digest of their content
+        digests = {
+            dest_rel: assets.source_digest(src_path)
+            for src_path, dest_rel in self.assets.values()
+        }
+        if IFRAME_DIR + VIEWER_FILENAME in outputs:
+            digests[IFRAME_DIR + VIEWER_FILENAME] = hashlib.sha256(
+                self.render_template(viewer=True).encode("utf8")
+            ).hexdigest()
+        digests.update(
+            (url, "") for url in outputs if url.endswith(".html") and url not in digests
+        )
+        spec_urls.update(
+            url for url in outputs if url.startswith((SPEC_DIR, REMOTE_SPEC_DIR))
+        )
+        version = hashlib.sha256(
+            json.dumps(digests, sort_keys=True).encode("utf8")
+        ).hexdigest()[:16]
+        return load_template(SERVICE_WORKER).render(
+            version=version,
+            precache_urls=sorted(digests),
+            spec_urls=sorted(spec_urls),
+        )
+
+    def report_profile(self, config):
+        """Log timings and counters of the build, write them as JSON if enabled"""
+
+        # hooks are timed, the post build hook included, so the report is last
+        sizes = self.writer.written_sizes
+        self.profiler.count("files_written", len(sizes))
+        self.profiler.count(
+            "iframes_written", len([url for url in sizes if url.endswith(".html")])
+        )
+        self.profiler.count("bytes_written", sum(sizes.values()))
+
+        summary = self.profiler.summary(self.config["profile_slowest"])
+        self.profiler.log_summary(summary)
+        if self.config["profile_report"]:
+            report.write_report(
+                config_path(config, self.config["profile_report"]), summary
             )
+
+    def on_build_error(self, error, **kwargs):
+        self.close_fetcher()
+
+    def close_fetcher(self):
+        if self.fetcher is not None:
+            self.fetcher.close()
+            self.fetcher = None
+
+    def find_assets(self):
+        """Map Redoc css and js files to their source and output path
+        Output paths contain a digest of the content with fingerprint_assets
+        """
+
+        asset_map = {}
+        for asset_dir in ("stylesheets", "javascripts"):
+            src_dir = os.path.join(base_path, "redoc", asset_dir)
+            for file_name in sorted(os.listdir(src_dir)):
+                src_path = os.path.join(src_dir, file_name)
+                asset_path = posixpath.join("assets", asset_dir, file_name)
+                dest_rel = asset_path
+                if self.config["fingerprint_assets"]:
+                    dest_rel = assets.fingerprint_path(
+                        asset_path, assets.source_digest(src_path)
+                    )
+                asset_map[asset_path] = (src_path, dest_rel)
+        return asset_map
+
+    def asset_url(self, asset_path, base_url):
+        """Return url of a Redoc css or js file relative to base_url"""
+
+        return utils.get_relative_url(
+            utils.normalize_url(self.assets[asset_path][1]), base_url
+        )
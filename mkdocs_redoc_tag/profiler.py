@@ -0,0 +1,101 @@
+import functools
+import time
+from contextlib import contextmanager
+
+from mkdocs_redoc_tag.report import log
+
+
+def timed(name):
+    """Record the time spent in a plugin hook, and in it for each page"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if not profiler.enabled:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler.add_time(profiler.hooks, name, elapsed)
+                page = kwargs.get("page")
+                if page is not None:
+                    profiler.add_page_time(page.file.src_uri, elapsed)
+
+        return wrapper
+
+    return decorator
+
+
+class Profiler:
+    """Timings and counters of the plugin for one build
+
+    Hooks are timed as a whole, stages are the parts of them worth telling
+    apart e.g. scanning pages, rendering templates or writing files.
+    Nothing is recorded when disabled.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.hooks = {}
+        self.stages = {}
+        self.pages = {}
+        self.counts = {}
+
+    def add_time(self, timings, name, elapsed):
+        timing = timings.setdefault(name, {"calls": 0, "seconds": 0.0})
+        timing["calls"] += 1
+        timing["seconds"] += elapsed
+
+    def add_page_time(self, page, elapsed):
+        self.pages[page] = self.pages.get(page, 0.0) + elapsed
+
+    @contextmanager
+    def timer(self, name, timings=None):
+        """Time a stage, or a hook when given the hook timings"""
+
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(
+                self.stages if timings is None else timings,
+                name,
+                time.perf_counter() - start,
+            )
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def summary(self, slowest=10):
+        """Return the recorded timings and counters, with the slowest pages"""
+
+        slowest_pages = sorted(self.pages.items(), key=lambda item: -item[1])
+        return {
+            "total_seconds": sum(timing["seconds"] for timing in self.hooks.values()),
+            "hooks": self.hooks,
+            "stages": self.stages,
+            "counts": self.counts,
+            "slowest_pages": [
+                {"page": page, "seconds": seconds}
+                for page, seconds in slowest_pages[:slowest]
+            ],
+        }
+
+    def log_summary(self, summary):
+        log.info(f"Redoc tag spent {summary['total_seconds']:.3f}s in build hooks")
+        for title, timings in (("hook", summary["hooks"]), ("stage", summary["stages"])):
+            for name, timing in sorted(timings.items(), key=lambda item: -item[1]["seconds"]):
+                log.info(
+                    f"  {title} {name}: {timing['seconds']:.3f}s in {timing['calls']} calls"
+                )
+        for name, value in sorted(summary["counts"].items()):
+            log.info(f"  {name}: {value}")
+        for item in summary["slowest_pages"]:
+            log.info(f"  slow page {item['page']}: {item['seconds']:.3f}s")
@@ -0,0 +1,219 @@
+// Source: https://github.com/blueswen/mkdocs-redoc-tag
+//
+// Page side of the plugin, included by pages with Redoc: color scheme sync
+// with mkdocs-material, lazy iframes, inline Redoc, links to operations and
+// the service worker. Options come from the data attributes of the script
+// element. mkdocs-material runs the script again on each instant navigation
+// to a page with Redoc, the first run sets everything up and later runs are
+// ignored.
+
+(function () {
+  if (window.redoc_tag) {
+    return;
+  }
+
+  const script = document.currentScript;
+  // javascripts directory, resolved now since instant navigation changes the
+  // document url
+  const js_url = new URL(".", script.src).href;
+  const dark_scheme_name = script.getAttribute("data-dark-scheme-name");
+  const root_margin = script.getAttribute("data-root-margin");
+  const scroll_y_offset = script.getAttribute("data-scroll-y-offset");
+  // file names of the Redoc bundle, fingerprinted when enabled
+  const redoc_js = script.getAttribute("data-redoc-js") || "redoc.standalone.js";
+  const redark_js = script.getAttribute("data-redark-js") || "redark.js";
+  const service_worker = script.getAttribute("data-service-worker");
+
+  const redoc_tag = (window.redoc_tag = {
+    bundle: null,
+    instances: [],
+    observer: null,
+  });
+
+  const is_dark = function () {
+    return dark_scheme_name !== null && window.scheme === dark_scheme_name;
+  };
+
+  const load_script = function (src) {
+    return new Promise(function (resolve, reject) {
+      const ele = document.createElement("script");
+      ele.src = src;
+      ele.onload = resolve;
+      ele.onerror = reject;
+      document.head.appendChild(ele);
+    });
+  };
+
+  // Redoc is loaded once per window for inline containers
+  const load_bundle = function () {
+    if (redoc_tag.bundle === null) {
+      redoc_tag.bundle = load_script(js_url + redoc_js)
+        .then(function () {
+          return load_script(js_url + redark_js);
+        })
+        .catch(function (error) {
+          // let the next page retry
+          redoc_tag.bundle = null;
+          throw error;
+        });
+    }
+    return redoc_tag.bundle;
+  };
+
+  const render_inline = function (ele) {
+    const dark = is_dark();
+    if (ele.redoc_dark_mode === dark) {
+      return;
+    }
+    if (ele.redoc_dark_mode === undefined) {
+      ele.redoc_background = ele.style.background;
+    } else {
+      Redoc.destroy(ele);
+    }
+    ele.redoc_dark_mode = dark;
+    ele.style.background = dark ? "#1e2129" : ele.redoc_background;
+    const spec_id = ele.getAttribute("data-spec-id");
+    const openapi_spec = spec_id
+      ? JSON.parse(document.getElementById(spec_id).textContent)
+      : ele.getAttribute("data-spec-url");
+    const options = dark ? { theme: redark } : {};
+    if (scroll_y_offset) {
+      options.scrollYOffset = scroll_y_offset;
+    }
+    Redoc.init(openapi_spec, options, ele);
+  };
+
+  const show = function (ele) {
+    ele.redoc_shown = true;
+    if (ele.tagName === "IFRAME") {
+      ele.src = ele.getAttribute("data-src");
+      ele.removeAttribute("data-src");
+      return;
+    }
+    load_bundle().then(function () {
+      if (!document.body.contains(ele)) {
+        // page left while Redoc was loading
+        return;
+      }
+      redoc_tag.instances.push(ele);
+      render_inline(ele);
+    });
+  };
+
+  const update_scheme = function () {
+    const iframe_list = document.getElementsByClassName("redoc-iframe");
+    for (let i = 0; i < iframe_list.length; i++) {
+      const ele = iframe_list.item(i);
+      // skip iframe which is not loaded yet
+      if (ele && ele.contentWindow && ele.contentWindow.enable_dark_mode) {
+        if (is_dark()) {
+          ele.contentWindow.enable_dark_mode();
+        } else {
+          ele.contentWindow.disable_dark_mode();
+        }
+      }
+    }
+    redoc_tag.instances.forEach(render_inline);
+  };
+
+  // operation index entries link to #<embed id>/operation/<operationId>
+  const show_operation = function () {
+    const hash = window.location.hash.slice(1);
+    const index = hash.indexOf("/");
+    if (index < 0) {
+      return;
+    }
+    const ele = document.getElementById(decodeURIComponent(hash.slice(0, index)));
+    if (!ele || !ele.matches(".redoc-iframe, .redoc-inline")) {
+      return;
+    }
+    const anchor = "#" + hash.slice(index + 1);
+    if (ele.tagName === "IFRAME") {
+      // a lazy iframe gets the anchor once it is shown
+      const attr = ele.hasAttribute("data-src") ? "data-src" : "src";
+      ele.setAttribute(attr, ele.getAttribute(attr).split("#")[0] + anchor);
+    } else {
+      // inline Redoc follows the location of the page
+      history.replaceState(history.state, "", anchor);
+      if (ele.redoc_dark_mode !== undefined) {
+        window.dispatchEvent(new HashChangeEvent("hashchange"));
+      }
+    }
+    ele.scrollIntoView();
+  };
+
+  // runs for the first page and for every instant navigation
+  const update_page = function () {
+    // release instances of the page left
+    redoc_tag.instances = redoc_tag.instances.filter(function (ele) {
+      if (document.body.contains(ele)) {
+        return true;
+      }
+      Redoc.destroy(ele);
+      return false;
+    });
+    if (redoc_tag.observer) {
+      redoc_tag.observer.disconnect();
+      redoc_tag.observer = null;
+    }
+    if (dark_scheme_name !== null) {
+      window.scheme = document.body.getAttribute("data-md-color-scheme");
+    }
+    show_operation();
+
+    const pending = Array.prototype.filter.call(
+      document.querySelectorAll("iframe.redoc-iframe[data-src], div.redoc-inline"),
+      function (ele) {
+        return !ele.redoc_shown;
+      }
+    );
+    if (root_margin === null || !("IntersectionObserver" in window)) {
+      pending.forEach(show);
+      return;
+    }
+    const observer = new IntersectionObserver(
+      function (entries) {
+        entries.forEach(function (entry) {
+          if (entry.isIntersecting) {
+            observer.unobserve(entry.target);
+            show(entry.target);
+          }
+        });
+      },
+      { rootMargin: root_margin }
+    );
+    pending.forEach(function (ele) {
+      observer.observe(ele);
+    });
+    redoc_tag.observer = observer;
+  };
+
+  if (dark_scheme_name !== null) {
+    // body is kept by instant navigation, one observer serves every page
+    new MutationObserver(function () {
+      const new_scheme = document.body.getAttribute("data-md-color-scheme");
+      if (new_scheme === window.scheme) {
+        // palette changed without changing the scheme
+        return;
+      }
+      window.scheme = new_scheme;
+      update_scheme();
+    }).observe(document.body, { attributeFilter: ["data-md-color-scheme"] });
+  }
+
+  if (service_worker !== null && "serviceWorker" in navigator) {
+    // relative to the first page, scoped to the site root it is served from
+    navigator.serviceWorker
+      .register(new URL(service_worker, document.baseURI).href)
+      .catch(function (error) {
+        console.warn("Redoc service worker registration failed", error);
+      });
+  }
+
+  window.addEventListener("hashchange", show_operation);
+  update_page();
+  if (typeof document$ !== "undefined") {
+    // support compatible with mkdocs-material Instant loading feature
+    document$.subscribe(update_page);
+  }
+})();
@@ -0,0 +1,95 @@
+// Source: https://github.com/blueswen/mkdocs-redoc-tag
+//
+// Service worker of the plugin, generated at build time with the files the
+// build emitted. Redoc assets and iframe html are precached, OpenAPI specs
+// are served from the cache while being revalidated. Other requests are left
+// to the browser.
+
+const cache_name = "redoc-tag-{{ version }}";
+const precache_urls = {{ precache_urls | tojson }};
+const spec_urls = {{ spec_urls | tojson }};
+
+// urls are relative to the worker, the site root
+const to_path = function (url) {
+  const parsed = new URL(url, self.location.href);
+  return parsed.origin + parsed.pathname;
+};
+const precache_paths = new Set(precache_urls.map(to_path));
+const spec_paths = new Set(spec_urls.map(to_path));
+
+self.addEventListener("install", function (event) {
+  event.waitUntil(
+    caches
+      .open(cache_name)
+      .then(function (cache) {
+        return cache.addAll(precache_urls);
+      })
+      .then(function () {
+        return self.skipWaiting();
+      })
+  );
+});
+
+self.addEventListener("activate", function (event) {
+  // drop caches of previous builds
+  event.waitUntil(
+    caches
+      .keys()
+      .then(function (keys) {
+        return Promise.all(
+          keys
+            .filter(function (key) {
+              return key.startsWith("redoc-tag-") && key !== cache_name;
+            })
+            .map(function (key) {
+              return caches.delete(key);
+            })
+        );
+      })
+      .then(function () {
+        return self.clients.claim();
+      })
+  );
+});
+
+const cache_first = function (request) {
+  return caches.open(cache_name).then(function (cache) {
+    // the viewer gets its spec in the query string
+    return cache.match(request, { ignoreSearch: true }).then(function (response) {
+      return response || fetch(request);
+    });
+  });
+};
+
+const stale_while_revalidate = function (event) {
+  return caches.open(cache_name).then(function (cache) {
+    return cache.match(event.request).then(function (cached) {
+      const fetched = fetch(event.request).then(function (response) {
+        if (response.ok) {
+          return cache.put(event.request, response.clone()).then(function () {
+            return response;
+          });
+        }
+        return response;
+      });
+      if (!cached) {
+        return fetched;
+      }
+      // keep the worker alive until the cache is updated
+      event.waitUntil(fetched.catch(function () {}));
+      return cached;
+    });
+  });
+};
+
+self.addEventListener("fetch", function (event) {
+  if (event.request.method !== "GET") {
+    return;
+  }
+  const path = to_path(event.request.url);
+  if (precache_paths.has(path)) {
+    event.respondWith(cache_first(event.request));
+  } else if (spec_paths.has(path)) {
+    event.respondWith(stale_while_revalidate(event));
+  }
+});
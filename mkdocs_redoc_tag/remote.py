@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from mkdocs_redoc_tag.cache import REMOTE_DIR, write_atomic
+
+log = logging.getLogger(__name__)
+
+
+class RemoteFetcher:
+    """Fetch remote specs on a bounded thread pool
+
+    Responses are kept in cache_dir with their ETag and Last-Modified headers,
+    so a later build only downloads a spec when the server says it changed.
+    """
+
+    def __init__(self, cache_dir=None, max_workers=4, timeout=30):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+
+    def cache_paths(self, url):
+        name = hashlib.sha256(url.encode("utf8")).hexdigest()
+        return (
+            os.path.join(self.cache_dir, REMOTE_DIR, f"{name}.json"),
+            os.path.join(self.cache_dir, REMOTE_DIR, f"{name}.body"),
+        )
+
+    def load_cached(self, url):
+        """Return headers and body of the cached response, None if missing"""
+
+        if self.cache_dir is None:
+            return None, None
+        meta_path, body_path = self.cache_paths(url)
+        try:
+            with open(meta_path, encoding="utf8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def touch_cached(self, url):
+        """Keep a cached response still in use from eviction"""
+
+        for path in self.cache_paths(url):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def save_cached(self, url, headers, body):
+        if self.cache_dir is None:
+            return
+        meta_path, body_path = self.cache_paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+        }
+        try:
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            tmp_path = f"{body_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+            write_atomic(meta_path, json.dumps(meta))
+        except OSError as e:
+            log.warning(f"Can't write Redoc remote spec cache to '{self.cache_dir}': {e}")
+
+    def fetch(self, url):
+        """Download a spec, None if it can't be fetched"""
+
+        if urlsplit(url).scheme not in ("http", "https"):
+            log.warning(f"Redoc spec '{url}' can't be prefetched: not an http(s) url")
+            return None
+
+        meta, cached_body = self.load_cached(url)
+        headers = {"User-Agent": "mkdocs-redoc-tag"}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            # only http and https urls get here, urlopen won't read local files
+            request = Request(url, headers=headers)
+            with urlopen(request, timeout=self.timeout) as response:  # nosec B310
+                body = response.read()
+                self.save_cached(url, response.headers, body)
+                return body
+        except HTTPError as e:
+            if e.code == 304 and cached_body is not None:
+                self.touch_cached(url)
+                return cached_body
+            log.warning(f"Redoc spec '{url}' can't be prefetched: HTTP {e.code}")
+        except (URLError, OSError) as e:
+            log.warning(f"Redoc spec '{url}' can't be prefetched: {e}")
+        return None
+
+    def prefetch(self, url):
+        """Start fetching a spec in the background"""
+
+        if url not in self.futures:
+            self.futures[url] = self.executor.submit(self.fetch, url)
+
+    def get(self, url):
+        """Wait for a spec and return its content, None if it can't be fetched"""
+
+        self.prefetch(url)
+        return self.futures[url].result()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for future in self.futures.values():
+            future.cancel()
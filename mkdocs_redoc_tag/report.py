@@ -0,0 +1,15 @@
+import json
+import logging
+import os
+
+# under the mkdocs logger, so messages are printed by mkdocs and warnings fail
+# mkdocs build --strict
+log = logging.getLogger("mkdocs.plugins.redoc_tag")
+
+
+def write_report(path, report):
+    """Write a report of the build as JSON, e.g. to be tracked by CI"""
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import html
+import re
+from typing import NamedTuple
+
+# Attributes are matched as leniently as html.parser does: they may follow a
+# quote without whitespace, and a slash not closing the tag is skipped. The
+# attribute list is matched once in a lookahead, which is never backtracked
+# into, the same as the parser takes the first match.
+ATTR = r"""(?<=['"\s/])[^\s/>][^\s/=>]*(?:\s*=+\s*(?:'[^']*'|"[^"]*"|(?!['"])[^>\s]*))?(?:\s|/(?!>))*"""
+ATTR_RE = re.compile(
+    r"""((?<=['"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*('[^']*'|"[^"]*"|(?!['"])[^>\s]*))?"""
+)
+
+# Only tokens the rewriter cares about are matched, everything else is skipped
+# by the regex engine. Comments and raw text elements are matched as a whole so
+# a redoc tag inside them is not taken into account, the same as an HTML parser.
+TOKEN_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(?P<raw>script|style)(?=[\s/>])[^>]*>.*?</(?P=raw)\s*>"
+    r"|</\s*(?P<close>redoc)(?=[\s/>])[^>]*>"
+    rf"|<(?P<name>redoc)(?=[\s/>])(?=(?P<attrs>[\s/]*(?:{ATTR})*))(?P=attrs)"
+    r"\s*(?P<self_close>/?)>",
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+class RedocTag(NamedTuple):
+    """Position and attributes of a redoc element in the document"""
+
+    start: int
+    end: int
+    attrs: dict[str, str]
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+
+def parse_attrs(text: str) -> dict[str, str]:
+    """Parse tag attributes like an HTML parser does"""
+
+    attrs = {}
+    for name, rest, value in ATTR_RE.findall(text):
+        if not rest:
+            value = ""
+        elif value[:1] == value[-1:] and value[:1] in ("'", '"'):
+            value = value[1:-1]
+        # the last occurrence of a duplicated attribute wins
+        attrs[name.lower()] = html.unescape(value)
+    return attrs
+
+
+def scan(output: str) -> list[RedocTag]:
+    """Find all redoc elements
+
+    A redoc element spans from its start tag to the matching end tag, or is the
+    start tag alone when it is self-closing or never closed. A redoc element
+    nested into another one is part of it, the same as in a parsed document.
+    """
+
+    redoc_tags = []
+    open_tags = []
+
+    for match in TOKEN_RE.finditer(output):
+        if match.group("close"):
+            if open_tags:
+                index = open_tags.pop()
+                redoc_tags[index] = redoc_tags[index]._replace(end=match.end())
+            continue
+        if match.group("name") is None:
+            continue
+
+        redoc_tags.append(
+            RedocTag(match.start(), match.end(), parse_attrs(match.group("attrs")))
+        )
+        if not match.group("self_close"):
+            open_tags.append(len(redoc_tags) - 1)
+
+    outer_tags = []
+    for tag in redoc_tags:
+        if outer_tags and tag.start < outer_tags[-1].end:
+            continue
+        outer_tags.append(tag)
+    return outer_tags
+
+
+def splice(output: str, replacements: list[tuple[int, int, str]]) -> str:
+    """Replace the given (start, end) spans with new text and keep the rest"""
+
+    chunks = []
+    position = 0
+    for start, end, text in sorted(replacements, key=lambda item: item[:2]):
+        chunks.append(output[position:start])
+        chunks.append(text)
+        position = end
+    chunks.append(output[position:])
+    return "".join(chunks)
+
+
+def build_tag(name: str, attrs: dict[str, str], content: str = "") -> str:
+    """Serialize an element, attributes are sorted the same as BeautifulSoup"""
+
+    attrs_text = "".join(
+        f' {key}="{html.escape(str(value))}"' for key, value in sorted(attrs.items())
+    )
+    return f"<{name}{attrs_text}>{content}</{name}>"
@@ -0,0 +1,520 @@
+import json
+import os
+import re
+from urllib.parse import unquote as urlunquote
+from urllib.parse import urljoin, urlsplit
+
+import yaml
+
+# root fields holding reusable objects of OpenAPI 3 and Swagger 2
+COMPONENT_KEYS = ("components", "definitions", "parameters", "responses")
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+# YAML 1.2 core schema, read by Redoc, instead of the YAML 1.1 one of PyYAML:
+# no yes/no/on/off booleans, sexagesimal numbers, octal without 0o or
+# timestamps. Decimals with leading zeros are kept as strings.
+CORE_SCHEMA_RESOLVERS = [
+    ("tag:yaml.org,2002:null", r"^(?:~|null|Null|NULL|)$", ["~", "n", "N", ""]),
+    ("tag:yaml.org,2002:bool", r"^(?:true|True|TRUE|false|False|FALSE)$", "tTfF"),
+    (
+        "tag:yaml.org,2002:int",
+        r"^(?:[-+]?(?:0|[1-9][0-9]*)|0o[0-7]+|0x[0-9a-fA-F]+)$",
+        "-+0123456789",
+    ),
+    (
+        "tag:yaml.org,2002:float",
+        (
+            r"^(?:[-+]?(?:\.[0-9]+|(?:0|[1-9][0-9]*)(?:\.[0-9]*)?)(?:[eE][-+]?[0-9]+)?"
+            r"|[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN))$"
+        ),
+        "-+.0123456789",
+    ),
+    ("tag:yaml.org,2002:merge", r"^(?:<<)$", "<"),
+]
+
+
+class SpecLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """YAML loader resolving plain scalars with the YAML 1.2 core schema"""
+
+
+SpecLoader.yaml_implicit_resolvers = {}
+for tag, pattern, first in CORE_SCHEMA_RESOLVERS:
+    SpecLoader.add_implicit_resolver(tag, re.compile(pattern), list(first))
+
+
+class SpecError(Exception):
+    """OpenAPI Specification can't be loaded or bundled"""
+
+
+def loads(content, path):
+    """Parse YAML or JSON content, path is the file or url it comes from"""
+
+    try:
+        if path.lower().endswith(".json"):
+            return json.loads(content)
+        # SpecLoader is a SafeLoader, only its implicit resolvers differ
+        return yaml.load(content, Loader=SpecLoader)  # nosec B506
+    except (ValueError, yaml.YAMLError) as e:
+        raise SpecError(f"Can't parse '{path}': {e}") from e
+
+
+def load_file(path):
+    """Load a YAML or JSON file"""
+
+    try:
+        with open(path, encoding="utf-8-sig") as f:
+            content = f.read()
+    except OSError as e:
+        raise SpecError(f"Can't read '{path}': {e.strerror}") from e
+    except ValueError as e:
+        raise SpecError(f"Can't parse '{path}': {e}") from e
+    return loads(content, path)
+
+
+def escape_pointer_token(token):
+    """Escape a JSON pointer reference token"""
+
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def resolve_pointer(document, pointer, path):
+    """Return the node a JSON pointer refers to"""
+
+    node = document
+    if not pointer:
+        return node
+    if not pointer.startswith("/"):
+        raise SpecError(f"Invalid JSON pointer '{pointer}' in '{path}'")
+    for token in pointer[1:].split("/"):
+        token = token.replace("~1", "/").replace("~0", "~")
+        try:
+            if isinstance(node, list):
+                node = node[int(token)]
+            elif isinstance(node, dict):
+                node = node[token] if token in node else node[int(token)]
+            else:
+                raise KeyError(token)
+        except (KeyError, IndexError, ValueError):
+            raise SpecError(f"Can't resolve '{pointer}' in '{path}'") from None
+    return node
+
+
+def validate(spec, path):
+    """Check the document looks like an OpenAPI Specification"""
+
+    if not isinstance(spec, dict) or not ("openapi" in spec or "swagger" in spec):
+        raise SpecError(
+            f"'{path}' is not an OpenAPI Specification, "
+            "'openapi' or 'swagger' field is missing"
+        )
+
+
+def dumps(spec):
+    """Serialize a spec to compact JSON"""
+
+    return json.dumps(spec, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def escape_script(content):
+    """Escape JSON to be put into a script element of an html"""
+
+    return (
+        content.replace("<", "\\u003c")
+        .replace("\u2028", "\\u2028")
+        .replace("\u2029", "\\u2029")
+    )
+
+
+class Bundler:
+    """Bundle an OpenAPI Specification split across files into one document
+
+    A relative $ref to another file is replaced with the referenced content on
+    its first occurrence. Every later $ref to the same target, circular ones
+    included, points to the location of that first occurrence in the bundle.
+    $ref to urls are left to Redoc.
+    """
+
+    def __init__(self, root_path):
+        self.root_path = os.path.normpath(os.path.abspath(root_path))
+        self.documents = {}
+        self.inlined = {}
+
+    @property
+    def files(self):
+        """All files the spec has been bundled from"""
+
+        return set(self.documents)
+
+    def load(self, path):
+        if path not in self.documents:
+            self.documents[path] = load_file(path)
+        return self.documents[path]
+
+    def join(self, base_path, ref_path):
+        """Path of the file a $ref of the file at base_path refers to"""
+
+        return os.path.normpath(
+            os.path.join(os.path.dirname(base_path), urlunquote(ref_path))
+        )
+
+    def bundle(self):
+        root = self.load(self.root_path)
+        validate(root, self.root_path)
+        # walk reusable components first, so shared content referenced by them
+        # is inlined into components rather than into the first path using it
+        walked = {}
+        for key in sorted(root, key=lambda key: key not in COMPONENT_KEYS):
+            walked[key] = self.walk(
+                root[key], self.root_path, f"/{escape_pointer_token(key)}"
+            )
+        return {key: walked[key] for key in root}
+
+    def walk(self, node, base_path, location):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str):
+                return self.resolve_ref(node, ref, base_path, location)
+            return {
+                key: self.walk(
+                    val, base_path, f"{location}/{escape_pointer_token(key)}"
+                )
+                for key, val in node.items()
+            }
+        if isinstance(node, list):
+            return [
+                self.walk(val, base_path, f"{location}/{ind}")
+                for ind, val in enumerate(node)
+            ]
+        return node
+
+    def resolve_ref(self, node, ref, base_path, location):
+        siblings = {
+            key: self.walk(val, base_path, f"{location}/{escape_pointer_token(key)}")
+            for key, val in node.items()
+            if key != "$ref"
+        }
+        ref_path, _, fragment = ref.partition("#")
+        if urlsplit(ref_path).scheme:
+            return {"$ref": ref, **siblings}
+
+        if ref_path:
+            target_path = self.join(base_path, ref_path)
+        else:
+            target_path = base_path
+        if target_path == self.root_path:
+            return {"$ref": f"#{fragment}", **siblings}
+
+        key = (target_path, urlunquote(fragment))
+        if key in self.inlined:
+            return {"$ref": f"#{self.inlined[key]}", **siblings}
+
+        self.inlined[key] = location
+        target = resolve_pointer(self.load(target_path), key[1], target_path)
+        target = self.walk(target, target_path, location)
+        if siblings and isinstance(target, dict):
+            target = {**target, **siblings}
+        return target
+
+
+class RemoteBundler(Bundler):
+    """Bundle a remote spec, its relative $ref are fetched against its url
+
+    fetch returns the content of a url, None if it can't be fetched.
+    """
+
+    def __init__(self, root_url, fetch):
+        self.root_path = root_url
+        self.fetch = fetch
+        self.documents = {}
+        self.inlined = {}
+
+    def parse(self, url, content):
+        try:
+            return loads(content.decode("utf-8-sig"), url)
+        except UnicodeDecodeError as e:
+            raise SpecError(f"Can't parse '{url}': {e}") from e
+
+    def load(self, path):
+        if path not in self.documents:
+            content = self.fetch(path)
+            if content is None:
+                raise SpecError(f"Can't fetch '{path}'")
+            self.documents[path] = self.parse(path, content)
+        return self.documents[path]
+
+    def join(self, base_path, ref_path):
+        return urljoin(base_path, ref_path)
+
+
+def bundle(path):
+    """Bundle a spec file
+    Return the bundled spec and all files it has been bundled from
+    """
+
+    bundler = Bundler(path)
+    return bundler.bundle(), bundler.files
+
+
+def bundle_remote(url, content, fetch):
+    """Bundle the fetched content of a remote spec with the documents its
+    relative $ref point to, fetched with fetch
+    Return None if it has no relative $ref, it then is used as it is
+    """
+
+    bundler = RemoteBundler(url, fetch)
+    bundler.documents[url] = bundler.parse(url, content)
+    if not any(is_file_ref(ref) for ref in iter_refs(bundler.documents[url])):
+        return None
+    return bundler.bundle()
+
+
+def iter_refs(node):
+    """Yield every $ref string of a document"""
+
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            yield ref
+        for key, val in node.items():
+            if key != "$ref":
+                yield from iter_refs(val)
+    elif isinstance(node, list):
+        for val in node:
+            yield from iter_refs(val)
+
+
+def is_file_ref(ref):
+    """Check whether a $ref points to another file by a relative url"""
+
+    ref_path = ref.partition("#")[0]
+    return bool(ref_path) and not urlsplit(ref_path).scheme
+
+
+def references(path):
+    """Return the files a spec references with relative $ref, transitively,
+    the spec included, without bundling it
+    Files which can't be loaded are listed without their own references
+    """
+
+    root_path = os.path.normpath(os.path.abspath(path))
+    files = set()
+    pending = [root_path]
+    while pending:
+        file_path = pending.pop()
+        if file_path in files:
+            continue
+        files.add(file_path)
+        try:
+            document = load_file(file_path)
+        except SpecError:
+            continue
+        for ref in iter_refs(document):
+            if is_file_ref(ref):
+                ref_path = ref.partition("#")[0]
+                pending.append(
+                    os.path.normpath(
+                        os.path.join(os.path.dirname(file_path), urlunquote(ref_path))
+                    )
+                )
+    return files
+
+
+def operations(spec):
+    """List method, path, id, summary and tags of the operations of a spec"""
+
+    operation_list = []
+    for path, path_item in (spec.get("paths") or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            item = {"method": method, "path": path}
+            for key in ("operationId", "summary"):
+                if isinstance(operation.get(key), str):
+                    item[key] = operation[key]
+            item["tags"] = [
+                tag for tag in operation.get("tags") or [] if isinstance(tag, str)
+            ]
+            operation_list.append(item)
+    return operation_list
+
+
+def match_operation(path, operation, tags=(), paths=(), operations=()):
+    """Check whether an operation has any of the tags, path prefixes or ids"""
+
+    return (
+        any(tag in tags for tag in operation.get("tags") or [])
+        or any(path.startswith(prefix) for prefix in paths)
+        or operation.get("operationId") in operations
+    )
+
+
+class Pruner:
+    """Keep the selected operations of a bundled spec and what they reference
+
+    Components are kept when referenced, directly or through other components,
+    by the kept content. A $ref into an operation which has been removed is
+    replaced with the content it refers to.
+    """
+
+    def __init__(self, spec, include=None, exclude=None):
+        self.spec = spec
+        self.include = include or {}
+        self.exclude = exclude or {}
+        self.paths = {}
+        self.components = {}
+        self.inlining = set()
+
+    def is_selected(self, path, operation):
+        if any(self.include.values()) and not match_operation(
+            path, operation, **self.include
+        ):
+            return False
+        return not match_operation(path, operation, **self.exclude)
+
+    def select_paths(self):
+        paths = {}
+        for path, path_item in (self.spec.get("paths") or {}).items():
+            if not isinstance(path_item, dict):
+                continue
+            if "$ref" in path_item:
+                # operations of a path item reference are only selected by path
+                if self.is_selected(path, {}):
+                    paths[path] = path_item
+                continue
+            item = {
+                key: val
+                for key, val in path_item.items()
+                if key not in HTTP_METHODS
+                or (isinstance(val, dict) and self.is_selected(path, val))
+            }
+            if any(key in HTTP_METHODS for key in item):
+                paths[path] = item
+        return paths
+
+    def prune(self):
+        self.paths = self.select_paths()
+        pruned = {}
+        for key, val in self.spec.items():
+            if key in COMPONENT_KEYS:
+                continue
+            if key == "paths":
+                val = self.paths
+            pruned[key] = self.walk(val)
+
+        if "components" in self.spec:
+            components = {}
+            for kind, items in self.spec["components"].items():
+                if kind == "securitySchemes" or not isinstance(items, dict):
+                    # security requirements refer to schemes by name
+                    components[kind] = self.walk(items)
+                    continue
+                kept = {
+                    name: self.components[("components", kind, name)]
+                    for name in items
+                    if ("components", kind, name) in self.components
+                }
+                if kept:
+                    components[kind] = kept
+            pruned["components"] = components
+        for key in COMPONENT_KEYS[1:]:
+            if isinstance(self.spec.get(key), dict):
+                pruned[key] = {
+                    name: self.components[(key, name)]
+                    for name in self.spec[key]
+                    if (key, name) in self.components
+                }
+
+        used_tags = {
+            tag
+            for path_item in self.paths.values()
+            for key, operation in path_item.items()
+            if key in HTTP_METHODS
+            for tag in operation.get("tags") or []
+        }
+        if isinstance(pruned.get("tags"), list):
+            pruned["tags"] = [
+                tag
+                for tag in pruned["tags"]
+                if not isinstance(tag, dict) or tag.get("name") in used_tags
+            ]
+        if isinstance(pruned.get("x-tagGroups"), list):
+            tag_groups = []
+            for group in pruned["x-tagGroups"]:
+                group_tags = [
+                    tag for tag in group.get("tags") or [] if tag in used_tags
+                ]
+                if group_tags:
+                    tag_groups.append({**group, "tags": group_tags})
+            pruned["x-tagGroups"] = tag_groups
+        return pruned
+
+    def use_pointer(self, pointer):
+        """Keep the component a JSON pointer of the spec points into"""
+
+        tokens = [
+            token.replace("~1", "/").replace("~0", "~")
+            for token in pointer[1:].split("/")
+        ]
+        size = 3 if tokens[0] == "components" else 2
+        if tokens[0] not in COMPONENT_KEYS or len(tokens) < size:
+            return
+        key = tuple(tokens[:size])
+        if key in self.components:
+            return
+        # reserved before walking, so circular references stop here
+        self.components[key] = None
+        target = resolve_pointer(
+            self.spec, "".join(f"/{escape_pointer_token(token)}" for token in key), "#"
+        )
+        self.components[key] = self.walk(target)
+
+    def resolve_ref(self, node, ref):
+        pointer = urlunquote(ref[1:])
+        if pointer.startswith("/paths/"):
+            try:
+                resolve_pointer({"paths": self.paths}, pointer, "#")
+            except SpecError:
+                if pointer not in self.inlining:
+                    # the operation holding the target has been removed
+                    self.inlining.add(pointer)
+                    target = self.walk(resolve_pointer(self.spec, pointer, "#"))
+                    self.inlining.discard(pointer)
+                    siblings = {
+                        key: self.walk(val)
+                        for key, val in node.items()
+                        if key != "$ref"
+                    }
+                    if siblings and isinstance(target, dict):
+                        target = {**target, **siblings}
+                    return target
+        else:
+            self.use_pointer(pointer)
+        return {key: self.walk(val) for key, val in node.items()}
+
+    def walk(self, node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/"):
+                return self.resolve_ref(node, ref)
+            mapping = node.get("mapping") if "propertyName" in node else None
+            if isinstance(mapping, dict):
+                # discriminator mapping refers to schemas without $ref
+                for val in mapping.values():
+                    if isinstance(val, str) and val.startswith("#/"):
+                        self.use_pointer(urlunquote(val[1:]))
+            return {key: self.walk(val) for key, val in node.items()}
+        if isinstance(node, list):
+            return [self.walk(val) for val in node]
+        return node
+
+
+def prune(spec, include=None, exclude=None):
+    """Keep the operations matching any include filter, all of them if there is
+    none, and no exclude filter, with the components they reference
+    Filters are dicts of tags, paths prefixes and operations ids
+    """
+
+    return Pruner(spec, include, exclude).prune()
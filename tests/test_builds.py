@@ -1,8 +1,15 @@
 # standard lib
+import gzip
+import http.server
+import json
 import logging
 import os
+import pathlib
+import posixpath
 import re
 import shutil
+import threading
+from urllib.parse import parse_qs, urlsplit
 
 # other 3rd party
 from bs4 import BeautifulSoup
@@ -10,6 +17,11 @@ from click.testing import CliRunner
 
 # MkDocs
 from mkdocs.__main__ import build_command
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+
+# plugin
+from mkdocs_redoc_tag import assets, cache, plugin, remote, spec
 
 # ##################################
 # ######## Globals #################
@@ -18,6 +30,9 @@ from mkdocs.__main__ import build_command
 # custom log level to get plugin info messages
 logging.basicConfig(level=logging.INFO)
 
+# iframe html location in a built site
+IFRAME_DIR = "site/assets/redoc"
+
 # ##################################
 # ########## Helpers ###############
 # ##################################
@@ -56,11 +71,12 @@ def setup_clean_mkdocs_folder(
     return testproject_path
 
 
-def build_docs_setup(testproject_path: str):
+def build_docs_setup(testproject_path: str, args=None):
     """
     Runs the `mkdocs build` command
     Args:
         testproject_path (Path): Path to test project
+        args (list): Extra arguments of the command
     Returns:
         command: Object with results of command
     """
@@ -71,7 +87,7 @@ def build_docs_setup(testproject_path: str):
 
     try:
         runner = CliRunner()
-        run = runner.invoke(build_command)
+        run = runner.invoke(build_command, args or [])
         os.chdir(cwd)
         return run
     except:
@@ -143,6 +159,17 @@ def validate_static(html_content: str, path: str = "", exist: bool = True):
     )
 
 
+def read_manifest(testproject_path):
+    """
+    Load the manifest of the builds of a test project
+    """
+    path = assets.manifest_path(
+        str(testproject_path / ".cache/plugin/redoc-tag"),
+        str(testproject_path / "site"),
+    )
+    return json.loads(pathlib.Path(path).read_text(encoding="utf8"))
+
+
 def validate_iframe(html_content, iframe_src_dir):
     """
     Validate target iframe html exist
@@ -161,13 +188,17 @@ def validate_iframe(html_content, iframe_src_dir):
         iframe_src = iframe_tag.attrs.get("src")
         assert iframe_id is not None
         assert iframe_src is not None
-        assert f"redoc-{iframe_id}.html" == iframe_src
-        iframe_file = iframe_src_dir / iframe_src
+        # repeated embeds share a document, their ids get the occurrence index
+        document_id = re.sub(r"-\d+$", "", iframe_id)
+        assert f"redoc-{document_id}.html" == os.path.basename(iframe_src)
+        iframe_file = (iframe_src_dir / iframe_src).resolve()
+        assert iframe_file.parent.match("site/assets/redoc")
         assert iframe_file.exists()
         iframe_content = iframe_file.read_text(encoding="utf8")
         iframe_content_list.append(iframe_content)
         iframe_id_list.append(iframe_id)
 
+    assert len(set(iframe_id_list)) == len(iframe_id_list)
     return iframe_content_list
 
 
@@ -175,16 +206,19 @@ def validate_additional_script_code(html_content, exists=True):
     pass
 
 
-def validate_additional_script_code_for_material(html_content, exists=True):
-    assert exists == (
-        'window.scheme = document.body.getAttribute("data-md-color-scheme")'
-        in html_content
+def find_page_script(html_content):
+    return BeautifulSoup(html_content, "html.parser").find(
+        "script", src=re.compile(r"redoc-tag\.js$")
     )
+
+
+def validate_additional_script_code_for_material(html_content, exists=True):
+    script_tag = find_page_script(html_content)
     assert exists == (
-        """document$.subscribe(() => {
-            const dark_scheme_name = """
-        in html_content
+        script_tag is not None and script_tag.has_attr("data-dark-scheme-name")
     )
+    # dark mode is synchronized by a static asset instead of inline code
+    assert "MutationObserver" not in html_content
 
 
 # ##################################
@@ -213,7 +247,7 @@ def test_basic(tmp_path):
     )
     assert regex_obj
     openapi_spec_url = regex_obj.group(1)
-    assert (file.parent / openapi_spec_url).resolve().exists()
+    assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
 
 
 def test_basic_sub_dir(tmp_path):
@@ -236,7 +270,7 @@ def test_basic_sub_dir(tmp_path):
     )
     assert regex_obj
     openapi_spec_url = regex_obj.group(1)
-    assert (file.parent / openapi_spec_url).resolve().exists()
+    assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
 
 
 def test_use_directory_urls(tmp_path):
@@ -261,7 +295,7 @@ def test_use_directory_urls(tmp_path):
     )
     assert regex_obj
     openapi_spec_url = regex_obj.group(1)
-    assert (file.parent / openapi_spec_url).resolve().exists()
+    assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
 
 
 def test_use_directory_urls_sub_dir(tmp_path):
@@ -286,7 +320,7 @@ def test_use_directory_urls_sub_dir(tmp_path):
     )
     assert regex_obj
     openapi_spec_url = regex_obj.group(1)
-    assert (file.parent / openapi_spec_url).resolve().exists()
+    assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
 
 
 def test_material(tmp_path):
@@ -298,7 +332,18 @@ def test_material(tmp_path):
     file = testproject_path / "site/index.html"
     contents = file.read_text(encoding="utf8")
     validate_additional_script_code_for_material(contents, exists=True)
-    assert 'const dark_scheme_name = "slate"' in contents
+    script_tag = find_page_script(contents)
+    assert script_tag["data-dark-scheme-name"] == "slate"
+    assert (file.parent / script_tag["src"]).resolve() == (
+        testproject_path / "site/assets/javascripts/redoc-tag.js"
+    )
+    # script is inside the content, mkdocs-material runs it on instant loading
+    assert script_tag.find_parent(class_="md-content") is not None
+
+    empty_contents = (testproject_path / "site/empty/index.html").read_text(
+        encoding="utf8"
+    )
+    validate_additional_script_code_for_material(empty_contents, exists=False)
 
     iframe_content_list = validate_iframe(contents, file.parent)
     assert len(iframe_content_list) == 1
@@ -311,7 +356,7 @@ def test_material(tmp_path):
     )
     assert regex_obj
     openapi_spec_url = regex_obj.group(1)
-    assert (file.parent / openapi_spec_url).resolve().exists()
+    assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
 
 
 def test_material_dark_scheme_name(tmp_path):
@@ -323,7 +368,17 @@ def test_material_dark_scheme_name(tmp_path):
     file = testproject_path / "site/index.html"
     contents = file.read_text(encoding="utf8")
     validate_additional_script_code_for_material(contents, exists=True)
-    assert 'const dark_scheme_name = "white"' in contents
+    assert find_page_script(contents)["data-dark-scheme-name"] == "white"
+
+    iframe_content_list = validate_iframe(contents, file.parent)
+    assert len(iframe_content_list) == 1
+    iframe_contents = iframe_content_list[0]
+    assert 'const dark_scheme_name = "white";' in iframe_contents
+    # specs are fetched once whatever the number of scheme changes
+    assert "spec_responses.get(url)" in iframe_contents
+    assert iframe_contents.index("window.fetch = ") < iframe_contents.index(
+        "redoc.standalone.js"
+    )
 
 
 def test_url(tmp_path):
@@ -368,11 +423,612 @@ def test_multiple(tmp_path):
         assert regex_obj
         if ind == 0 or ind == 1:
             openapi_spec_url = regex_obj.group(1)
-            assert (file.parent / openapi_spec_url).resolve().exists()
+            assert (testproject_path / IFRAME_DIR / openapi_spec_url).resolve().exists()
         elif ind == 2:
             assert regex_obj.group(1) == "https://petstore.swagger.io/v2/swagger.json"
 
 
+def test_iframe_content_addressed(tmp_path):
+    """
+    Validate iframe html is named after its content and shared by pages
+    """
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    url_contents = (testproject_path / "site/url/index.html").read_text(encoding="utf8")
+    multiple_contents = (testproject_path / "site/multiple/index.html").read_text(
+        encoding="utf8"
+    )
+    url_iframe_id = BeautifulSoup(url_contents, "html.parser").iframe["id"]
+    multiple_iframe_id_list = [
+        iframe["id"]
+        for iframe in BeautifulSoup(multiple_contents, "html.parser").find_all("iframe")
+    ]
+    assert url_iframe_id in multiple_iframe_id_list
+    iframe_files = sorted(os.listdir(testproject_path / IFRAME_DIR))
+    # five embeds across pages of three distinct specs
+    assert len(iframe_files) == 3
+
+    # rebuild produces the same files
+    shutil.rmtree(testproject_path / "site")
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert sorted(os.listdir(testproject_path / IFRAME_DIR)) == iframe_files
+    assert (testproject_path / "site/url/index.html").read_text(
+        encoding="utf8"
+    ) == url_contents
+
+
+def test_bundle_specs(tmp_path):
+    """
+    Validate local OpenAPI spec is bundled into one minified JSON
+    """
+    mkdocs_file = "mkdocs-bundle.yml"
+    testproject_path = validate_mkdocs_file(
+        tmp_path,
+        f"tests/fixtures/{mkdocs_file}",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    file = testproject_path / "site/index.html"
+    contents = file.read_text(encoding="utf8")
+
+    iframe_content_list = validate_iframe(contents, file.parent)
+    assert len(iframe_content_list) == 1
+    regex_obj = re.search(
+        r"const openapi_spec_url = \"(.*)\";",
+        iframe_content_list[0],
+    )
+    assert regex_obj
+    openapi_spec_url = regex_obj.group(1)
+    assert re.match(r"specs/openapi-[0-9a-f]{16}\.json$", openapi_spec_url)
+    spec_content = (testproject_path / IFRAME_DIR / openapi_spec_url).read_text(
+        encoding="utf8"
+    )
+    assert "\n" not in spec_content
+    assert '$ref":"./' not in spec_content
+    assert json.loads(spec_content)["info"]["title"] == "Multi-file OpenAPI Spec"
+
+
+def test_prune_spec(tmp_path):
+    """
+    Validate redoc tag attributes select operations of the spec
+    """
+    mkdocs_file = "mkdocs-bundle.yml"
+    testproject_path = validate_mkdocs_file(
+        tmp_path,
+        f"tests/fixtures/{mkdocs_file}",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    file = testproject_path / "site/pets/index.html"
+    contents = file.read_text(encoding="utf8")
+
+    spec_list = []
+    for iframe_contents in validate_iframe(contents, file.parent):
+        regex_obj = re.search(r"const openapi_spec_url = \"(.*)\";", iframe_contents)
+        assert regex_obj
+        spec_list.append(
+            json.loads(
+                (testproject_path / IFRAME_DIR / regex_obj.group(1)).read_text(
+                    encoding="utf8"
+                )
+            )
+        )
+    pets, store = spec_list
+
+    assert list(pets["paths"]) == ["/pets/{petId}"]
+    assert sorted(pets["components"]["schemas"]) == ["Error", "Pet"]
+    assert [tag["name"] for tag in pets["tags"]] == ["pets"]
+    # the error response was shared with the removed listPets operation
+    assert "$ref" not in pets["paths"]["/pets/{petId}"]["get"]["responses"]["default"]
+
+    assert list(store["paths"]) == ["/store/orders"]
+    assert list(store["components"]["schemas"]) == ["Pet"]
+    assert "api_key" in store["components"]["securitySchemes"]
+
+
+def test_dirty_build(tmp_path):
+    """
+    Validate dirty builds render pages again when their spec changed and remove
+    generated files no page refers to anymore
+    """
+    mkdocs_file = "mkdocs-bundle.yml"
+    testproject_path = validate_mkdocs_file(
+        tmp_path,
+        f"tests/fixtures/{mkdocs_file}",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    spec_dir = testproject_path / IFRAME_DIR / "specs"
+    manifest = read_manifest(testproject_path)
+    assert sorted(manifest["pages"]) == ["index.md", "pets.md"]
+    assert len(manifest["pages"]["index.md"]["specs"]) == 6
+    spec_files = sorted(os.listdir(spec_dir))
+    assert len(spec_files) == 3
+    index_spec_mtime = {
+        name: os.stat(spec_dir / name).st_mtime_ns for name in spec_files
+    }
+
+    def touch(path, text):
+        path.write_text(text, encoding="utf8")
+        # newer than anything built so far
+        os.utime(path, ns=(2**62, 2**62))
+
+    # a page selecting other operations replaces its pruned specs
+    pets_page = testproject_path / "bundle_docs/pets.md"
+    touch(
+        pets_page,
+        '<redoc src="./openapi-spec/openapi.yaml" include-operations="listPets"/>\n',
+    )
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    new_spec_files = sorted(os.listdir(spec_dir))
+    assert len(new_spec_files) == 2
+    # the output of the page which wasn't built is kept and not written again
+    kept = [name for name in spec_files if name in new_spec_files]
+    assert len(kept) == 1
+    assert os.stat(spec_dir / kept[0]).st_mtime_ns == index_spec_mtime[kept[0]]
+
+    # a change of a file referenced by the spec renders the pages again
+    pet_file = testproject_path / "bundle_docs/openapi-spec/schemas/pet.yaml"
+    touch(pet_file, pet_file.read_text(encoding="utf8") + "description: A pet\n")
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert not set(new_spec_files) & set(os.listdir(spec_dir))
+    assert len(os.listdir(spec_dir)) == 2
+    for name in os.listdir(spec_dir):
+        assert "A pet" in (spec_dir / name).read_text(encoding="utf8")
+    iframe_files = list((testproject_path / IFRAME_DIR).glob("redoc-*.html"))
+    assert len(iframe_files) == 2
+
+
+def test_spec_dependencies(tmp_path, monkeypatch):
+    """
+    Validate pages loading a spec as is are rendered again when any file it
+    references changes
+    """
+    mkdocs_file = "mkdocs-dependencies.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}",
+        output_path=tmp_path,
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    (testproject_path / "bundle_docs/about.md").write_text("# About\n", encoding="utf8")
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    manifest = read_manifest(testproject_path)
+    pet_file = testproject_path / "bundle_docs/openapi-spec/schemas/pet.yaml"
+    assert len(manifest["pages"]["index.md"]["specs"]) == 6
+    # relative to the config directory
+    assert (
+        os.path.relpath(pet_file, testproject_path)
+        in manifest["pages"]["index.md"]["specs"]
+    )
+
+    # references are read once, then known from the cache until a file changes
+    monkeypatch.setattr(spec, "references", None)
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    monkeypatch.undo()
+
+    index_html = testproject_path / "site/index.html"
+    about_html = testproject_path / "site/about/index.html"
+    mtimes = [index_html.stat().st_mtime_ns, about_html.stat().st_mtime_ns]
+    pet_file.write_text(
+        pet_file.read_text(encoding="utf8") + "description: A pet\n", encoding="utf8"
+    )
+    os.utime(pet_file, ns=(2**62, 2**62))
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert index_html.stat().st_mtime_ns != mtimes[0]
+    assert about_html.stat().st_mtime_ns == mtimes[1]
+
+
+def test_spec_dependencies_untracked(tmp_path, monkeypatch):
+    """
+    Validate a plain build of specs loaded as is doesn't read their references
+    """
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    monkeypatch.setattr(spec, "references", None)
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert not (testproject_path / ".cache").exists()
+
+
+class WatchServer:
+    """Records the paths mkdocs serve would watch"""
+
+    def __init__(self):
+        self.watched = set()
+
+    def watch(self, path, func=None, *, recursive=True):
+        self.watched.add(path)
+
+    def unwatch(self, path):
+        self.watched.remove(path)
+
+
+def test_serve_watch(tmp_path):
+    """
+    Validate files referenced by specs outside docs_dir are watched by mkdocs serve
+    """
+    docs_dir = tmp_path / "docs"
+    shared_dir = tmp_path / "shared"
+    docs_dir.mkdir()
+    shared_dir.mkdir()
+    (shared_dir / "pet.yaml").write_text("type: object\n", encoding="utf8")
+    (docs_dir / "api.yaml").write_text(
+        "openapi: 3.0.3\n"
+        "info: {title: Pets, version: 1.0.0}\n"
+        "paths: {}\n"
+        "components:\n"
+        "  schemas:\n"
+        "    Pet: {$ref: '../shared/pet.yaml'}\n",
+        encoding="utf8",
+    )
+    page_file = docs_dir / "index.md"
+    page_file.write_text('<redoc src="./api.yaml"/>\n', encoding="utf8")
+    config_file = tmp_path / "mkdocs.yml"
+    config_file.write_text(
+        "site_name: test\nplugins:\n  - redoc-tag:\n      cache: false\n",
+        encoding="utf8",
+    )
+
+    config = load_config(str(config_file))
+    config.plugins.on_startup(command="serve", dirty=False)
+    build(config)
+    server = WatchServer()
+    config.plugins.on_serve(server, config=config, builder=None)
+    assert server.watched == {str(shared_dir / "pet.yaml")}
+
+    # the plugin is kept across builds and stops watching unused files
+    page_file.write_text("# No Redoc\n", encoding="utf8")
+    config = load_config(str(config_file))
+    assert config.plugins["redoc-tag"].server is server
+    build(config)
+    assert server.watched == set()
+
+
+def test_spec_cache(tmp_path, monkeypatch):
+    """
+    Validate processed OpenAPI spec is reused until any of its files changes
+    """
+    mkdocs_file = "mkdocs-bundle.yml"
+    testproject_path = validate_mkdocs_file(
+        tmp_path,
+        f"tests/fixtures/{mkdocs_file}",
+        docs_path="tests/fixtures/bundle_docs",
+    )
+    cache_dir = testproject_path / ".cache/plugin/redoc-tag"
+    # the spec and the two selections of its operations in pets.md
+    assert len(os.listdir(cache_dir / "specs")) == 3
+    spec_files = sorted(os.listdir(testproject_path / IFRAME_DIR / "specs"))
+
+    bundled_list = []
+    bundle = spec.bundle
+
+    def count_bundle(path):
+        bundled_list.append(path)
+        return bundle(path)
+
+    monkeypatch.setattr(spec, "bundle", count_bundle)
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert bundled_list == []
+    assert sorted(os.listdir(testproject_path / IFRAME_DIR / "specs")) == spec_files
+
+    # a change of a referenced file invalidates the cache
+    pet_file = testproject_path / "bundle_docs/openapi-spec/schemas/pet.yaml"
+    pet_file.write_text(
+        pet_file.read_text(encoding="utf8") + "description: A pet\n", encoding="utf8"
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    # bundled once for all selections
+    assert len(bundled_list) == 1
+    assert len(os.listdir(cache_dir / "specs")) == 6
+
+
+def test_operation_index(tmp_path, monkeypatch):
+    """
+    Validate operations of local specs are indexed with a link to their embed
+    """
+    mkdocs_file = "mkdocs-operation-index.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    site_path = testproject_path / "site"
+    index_file = site_path / "assets/redoc/operations.json"
+    operations = json.loads(index_file.read_text(encoding="utf8"))
+    # remote specs of url.md are not indexed
+    assert {entry["location"].partition("#")[0] for entry in operations} == {
+        "",
+        "multiple/",
+        "sub_dir/page_in_sub_dir/",
+    }
+    entry = next(
+        entry
+        for entry in operations
+        if entry["location"].startswith("multiple/")
+        and entry.get("operationId") == "listPets"
+    )
+    assert entry["method"] == "get"
+    assert entry["path"] == "/pets"
+    embed_id, _, anchor = entry["location"].partition("#")[2].partition("/")
+    assert anchor == "operation/listPets"
+    soup = BeautifulSoup(
+        (site_path / "multiple/index.html").read_text(encoding="utf8"), "html.parser"
+    )
+    assert soup.find("iframe", id=embed_id) is not None
+    assert find_page_script(str(soup)) is not None
+
+    search_index = json.loads(
+        (site_path / "search/search_index.json").read_text(encoding="utf8")
+    )
+    search_entry = next(
+        doc for doc in search_index["docs"] if doc["location"] == entry["location"]
+    )
+    assert search_entry["title"] == "GET /pets"
+    assert "listPets" in search_entry["text"]
+
+    # unchanged specs are not parsed again, pages not built again keep theirs
+    monkeypatch.setattr(spec, "bundle", None)
+    for args in ([], ["--dirty"]):
+        result = build_docs_setup(testproject_path, args)
+        assert result.exit_code == 0, "'mkdocs build' command failed"
+        assert json.loads(index_file.read_text(encoding="utf8")) == operations
+
+
+def test_operation_index_repeated_embeds(tmp_path):
+    """
+    Validate operations embedded twice on a page are indexed once
+    """
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path="tests/fixtures/mkdocs-operation-index.yml",
+        output_path=tmp_path,
+    )
+    (testproject_path / "docs/repeated.md").write_text(
+        '<redoc src="./openapi-spec/sample.yaml"/>\n'
+        '<redoc src="./openapi-spec/sample.yaml"/>\n',
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+
+    site_path = testproject_path / "site"
+    operations = [
+        entry
+        for entry in json.loads(
+            (site_path / "assets/redoc/operations.json").read_text(encoding="utf8")
+        )
+        if entry["location"].startswith("repeated/")
+    ]
+    assert operations
+    keys = [(entry["method"], entry["path"]) for entry in operations]
+    assert len(keys) == len(set(keys))
+    # linked to the first embed
+    embeds = {entry["location"].partition("/operation/")[0] for entry in operations}
+    assert len(embeds) == 1
+
+    search_index = json.loads(
+        (site_path / "search/search_index.json").read_text(encoding="utf8")
+    )
+    locations = [
+        doc["location"]
+        for doc in search_index["docs"]
+        if doc["location"].startswith("repeated/#")
+    ]
+    assert sorted(locations) == sorted(entry["location"] for entry in operations)
+
+
+def test_spec_cache_evict(tmp_path):
+    spec_cache = cache.SpecCache(str(tmp_path), max_size=10)
+    for ind in range(3):
+        path = str(tmp_path / f"spec-{ind}.yaml")
+        pathlib.Path(path).write_text(f"spec {ind}", encoding="utf8")
+        spec_cache.set(path, [path], "x" * 6)
+        os.utime(spec_cache.spec_path(spec_cache.key([path])), ns=(ind, ind))
+
+    assert len(spec_cache.evict()) == 2
+    assert spec_cache.get(str(tmp_path / "spec-2.yaml")) == "x" * 6
+    assert spec_cache.get(str(tmp_path / "spec-0.yaml")) is None
+
+    # cached responses of remote specs share the max size
+    fetcher = remote.RemoteFetcher(str(tmp_path))
+    fetcher.save_cached("https://example.com/openapi.yaml", {}, b"y" * 6)
+    for path in fetcher.cache_paths("https://example.com/openapi.yaml"):
+        os.utime(path, ns=(0, 0))
+    fetcher.close()
+    assert len(spec_cache.evict()) == 2
+    assert fetcher.load_cached("https://example.com/openapi.yaml") == (None, None)
+    assert spec_cache.get(str(tmp_path / "spec-2.yaml")) == "x" * 6
+
+
+def test_spec_cache_missing_file(tmp_path, caplog):
+    spec_cache = cache.SpecCache(str(tmp_path / "cache"), max_size=1024)
+    path = str(tmp_path / "spec.yaml")
+    pathlib.Path(path).write_text("spec", encoding="utf8")
+    spec_cache.set(path, [path, str(tmp_path / "missing.yaml")], "x")
+
+    # not cached, without a warning about writing the cache
+    assert spec_cache.get(path) is None
+    assert not (tmp_path / "cache").exists()
+    assert "Can't write" not in caplog.text
+
+
+def test_fetch_scheme(tmp_path):
+    spec_path = tmp_path / "openapi.yaml"
+    spec_path.write_text("openapi: 3.0.0", encoding="utf8")
+    fetcher = remote.RemoteFetcher(str(tmp_path))
+    assert fetcher.fetch(spec_path.as_uri()) is None
+    fetcher.close()
+
+
+class SpecRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Local stand-in of a service serving its OpenAPI spec with an ETag"""
+
+    spec_content = pathlib.Path(
+        "tests/fixtures/docs/openapi-spec/sample.yaml"
+    ).read_bytes()
+    # spec split across files, referenced with relative $ref
+    split_spec_dir = pathlib.Path("tests/fixtures/bundle_docs/openapi-spec").resolve()
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/openapi.yaml":
+            content = self.spec_content
+        elif self.path.startswith("/split/") and ".." not in self.path:
+            file = self.split_spec_dir / self.path[len("/split/") :]
+            if not file.is_file():
+                self.send_error(404)
+                return
+            content = file.read_bytes()
+        else:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class SpecServer(http.server.ThreadingHTTPServer):
+    """Records the requests it serves, one server per test"""
+
+    def __init__(self, handler_class):
+        super().__init__(("127.0.0.1", 0), handler_class)
+        self.requests = []
+
+
+def test_prefetch_remote(tmp_path):
+    """
+    Validate remote OpenAPI spec is fetched at build time and vendored
+    """
+    server = SpecServer(SpecRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    docs_path = tmp_path / "src" / "remote_docs"
+    docs_path.mkdir(parents=True)
+    (docs_path / "index.md").write_text(
+        f'<redoc src="{base_url}/openapi.yaml"/>\n'
+        f'<redoc src="{base_url}/missing.yaml"/>\n',
+        encoding="utf8",
+    )
+    (docs_path / "other.md").write_text(
+        f'<redoc src="{base_url}/openapi.yaml"/>\n', encoding="utf8"
+    )
+    try:
+        testproject_path = validate_mkdocs_file(
+            tmp_path, "tests/fixtures/mkdocs-remote.yml", docs_path=str(docs_path)
+        )
+        file = testproject_path / "site/index.html"
+        iframe_content_list = validate_iframe(
+            file.read_text(encoding="utf8"), file.parent
+        )
+        assert len(iframe_content_list) == 2
+        vendored, missing = [
+            re.search(r"const openapi_spec_url = \"(.*)\";", iframe_content).group(1)
+            for iframe_content in iframe_content_list
+        ]
+        assert re.match(r"remote/openapi-[0-9a-f]{16}\.yaml$", vendored)
+        assert (
+            testproject_path / IFRAME_DIR / vendored
+        ).read_bytes() == SpecRequestHandler.spec_content
+        # fall back to the live url
+        assert missing == f"{base_url}/missing.yaml"
+        # spec embedded by two pages is fetched once
+        assert server.requests.count(("/openapi.yaml", None)) == 1
+
+        result = build_docs_setup(testproject_path)
+        assert result.exit_code == 0, "'mkdocs build' command failed"
+        assert ("/openapi.yaml", '"v1"') in server.requests
+        assert (testproject_path / IFRAME_DIR / vendored).exists()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_prefetch_remote_references(tmp_path, caplog):
+    """
+    Validate a remote spec with relative $ref is vendored bundled with the files
+    they point to
+    """
+    server = SpecServer(SpecRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    docs_path = tmp_path / "src" / "remote_docs"
+    docs_path.mkdir(parents=True)
+    (docs_path / "index.md").write_text(
+        f'<redoc src="{base_url}/split/openapi.yaml"/>\n'
+        f'<redoc src="{base_url}/split/paths/pets.yaml"/>\n',
+        encoding="utf8",
+    )
+    try:
+        testproject_path = setup_clean_mkdocs_folder(
+            "tests/fixtures/mkdocs-remote.yml", tmp_path, docs_path=str(docs_path)
+        )
+        result = build_docs_setup(testproject_path)
+        assert result.exit_code == 0, "'mkdocs build' command failed"
+        file = testproject_path / "site/index.html"
+        iframe_content_list = validate_iframe(
+            file.read_text(encoding="utf8"), file.parent
+        )
+        bundled, not_spec = [
+            re.search(r"const openapi_spec_url = \"(.*)\";", iframe_content).group(1)
+            for iframe_content in iframe_content_list
+        ]
+        assert re.match(r"remote/openapi-[0-9a-f]{16}\.json$", bundled)
+        content = json.loads(
+            (testproject_path / IFRAME_DIR / bundled).read_text(encoding="utf8")
+        )
+        bundled_spec, _ = spec.bundle(
+            str(SpecRequestHandler.split_spec_dir / "openapi.yaml")
+        )
+        assert content == json.loads(spec.dumps(bundled_spec))
+        assert ("/split/schemas/pet.yaml", None) in server.requests
+        # a document which can't be bundled keeps its live url
+        assert not_spec == f"{base_url}/split/paths/pets.yaml"
+        assert f"'{base_url}/split/paths/pets.yaml' can't be bundled" in caplog.text
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_embed_spec(tmp_path):
+    """
+    Validate OpenAPI spec below the size threshold is embedded in iframe html
+    """
+    mkdocs_file = "mkdocs-embed.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    file = testproject_path / "site/multiple/index.html"
+    contents = file.read_text(encoding="utf8")
+
+    iframe_content_list = validate_iframe(contents, file.parent)
+    assert len(iframe_content_list) == 3
+    sample, oauth2, url = iframe_content_list
+
+    regex_obj = re.search(r"const openapi_spec_url = \"(.*)\";", sample)
+    assert regex_obj
+    assert (testproject_path / IFRAME_DIR / regex_obj.group(1)).resolve().exists()
+    assert 'id="openapi-spec"' not in sample
+
+    assert "const openapi_spec_url" not in oauth2
+    spec_script = BeautifulSoup(oauth2, "html.parser").find(id="openapi-spec")
+    assert json.loads(spec_script.string)["info"]["title"] == "FastAPI"
+
+    regex_obj = re.search(r"const openapi_spec_url = \"(.*)\";", url)
+    assert regex_obj
+    assert regex_obj.group(1) == "https://petstore.swagger.io/v2/swagger.json"
+
+
 def test_plugin_options(tmp_path):
     mkdocs_file = "mkdocs-options.yml"
     testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
@@ -391,6 +1047,230 @@ def test_plugin_options(tmp_path):
             assert f"{key}: {val}" in iframe_content
 
 
+def test_lazy_loading(tmp_path):
+    """
+    Validate iframe is only loaded once scrolled into view
+    """
+    mkdocs_file = "mkdocs-lazy.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    file = testproject_path / "site/multiple/index.html"
+    contents = file.read_text(encoding="utf8")
+
+    iframe_list = BeautifulSoup(contents, "html.parser").find_all("iframe")
+    assert len(iframe_list) == 3
+    for iframe_tag in iframe_list:
+        assert iframe_tag.get("src") is None
+        assert iframe_tag["loading"] == "lazy"
+        iframe_file = (file.parent / iframe_tag["data-src"]).resolve()
+        assert iframe_file.exists()
+    assert find_page_script(contents)["data-root-margin"] == "400px"
+
+    contents = (testproject_path / "site/empty/index.html").read_text(encoding="utf8")
+    assert find_page_script(contents) is None
+
+
+def test_viewer(tmp_path):
+    """
+    Validate every local spec is shown by the shared viewer
+    """
+    mkdocs_file = "mkdocs-viewer.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    viewer_file = testproject_path / IFRAME_DIR / "viewer.html"
+    assert viewer_file.exists()
+    assert "URLSearchParams(window.location.search)" in viewer_file.read_text(
+        encoding="utf8"
+    )
+    # only the remote spec, which the viewer refuses, has its own iframe html
+    iframe_files = list((testproject_path / IFRAME_DIR).glob("redoc-*.html"))
+    assert len(iframe_files) == 1
+    assert "https://petstore.swagger.io" in iframe_files[0].read_text(encoding="utf8")
+
+    file = testproject_path / "site/multiple/index.html"
+    contents = file.read_text(encoding="utf8")
+    iframe_list = BeautifulSoup(contents, "html.parser").find_all("iframe")
+    assert len(iframe_list) == 3
+    viewer_iframe_list = [
+        iframe_tag for iframe_tag in iframe_list if "?spec=" in iframe_tag["src"]
+    ]
+    assert len(viewer_iframe_list) == 2
+    for iframe_tag in viewer_iframe_list:
+        src = urlsplit(iframe_tag["src"])
+        assert (file.parent / src.path).resolve() == viewer_file.resolve()
+        spec_url = parse_qs(src.query)["spec"][0]
+        assert (viewer_file.parent / spec_url).resolve().exists()
+
+
+def test_inline(tmp_path):
+    """
+    Validate redoc tag is replaced with a container Redoc is rendered into
+    """
+    mkdocs_file = "mkdocs-inline.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    assert not list((testproject_path / IFRAME_DIR).glob("redoc-*.html"))
+
+    file = testproject_path / "site/multiple/index.html"
+    contents = file.read_text(encoding="utf8")
+    soup = BeautifulSoup(contents, "html.parser")
+    assert not soup.find_all("iframe")
+    sample, oauth2, url = soup.find_all("div", class_="redoc-inline")
+
+    assert (file.parent / sample["data-spec-url"]).resolve().exists()
+    spec_script = soup.find(id=oauth2["data-spec-id"])
+    assert json.loads(spec_script.string)["info"]["title"] == "FastAPI"
+    assert url["data-spec-url"] == "https://petstore.swagger.io/v2/swagger.json"
+
+    # Redoc bundle is loaded by the page script, once per window
+    assert "redoc.standalone.js" not in str(soup.find_all("script", src=True))
+    script_tag = find_page_script(contents)
+    assert script_tag["data-scroll-y-offset"] == ".md-header"
+    assert contents.index('class="redoc-inline"') < contents.index("redoc-tag.js")
+
+
+def test_repeated_embeds(tmp_path):
+    """
+    Validate repeated embeds on a page share their document with unique ids
+    """
+    for mkdocs_file in ("mkdocs.yml", "mkdocs-inline.yml"):
+        testproject_path = setup_clean_mkdocs_folder(
+            mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}",
+            output_path=tmp_path / mkdocs_file,
+        )
+        (testproject_path / "docs/repeated.md").write_text(
+            '<redoc src="./openapi-spec/sample.yaml"/>\n'
+            '<redoc src="./openapi-spec/sample-oauth2.yaml"/>\n'
+            '<redoc src="./openapi-spec/sample.yaml"/>\n'
+            '<redoc src="./openapi-spec/sample-oauth2.yaml"/>\n',
+            encoding="utf8",
+        )
+        result = build_docs_setup(testproject_path)
+        assert result.exit_code == 0, "'mkdocs build' command failed"
+
+        file = testproject_path / "site/repeated/index.html"
+        soup = BeautifulSoup(file.read_text(encoding="utf8"), "html.parser")
+        ids = [tag["id"] for tag in soup.find_all(id=True)]
+        assert len(ids) == len(set(ids))
+        embeds = soup.find_all(class_=["redoc-iframe", "redoc-inline"])
+        assert len(embeds) == 4
+        first, second = embeds[0]["id"], embeds[1]["id"]
+        assert [embed["id"] for embed in embeds] == [
+            first,
+            second,
+            f"{first}-1",
+            f"{second}-1",
+        ]
+        if mkdocs_file == "mkdocs.yml":
+            assert embeds[0]["src"] == embeds[2]["src"]
+        else:
+            # the embedded spec is put once on the page
+            assert embeds[1]["data-spec-id"] == embeds[3]["data-spec-id"]
+            assert len(soup.find_all(id=re.compile("^redoc-spec-"))) == 1
+
+
+def test_profile(tmp_path):
+    """
+    Validate build timings and counters are logged and written as JSON
+    """
+    mkdocs_file = "mkdocs-profile.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    # printed by mkdocs, under its logger
+    assert "Redoc tag spent" in result.output
+
+    report = json.loads(
+        (testproject_path / "reports/redoc-tag-profile.json").read_text(encoding="utf8")
+    )
+    for hook in ("on_pre_build", "on_page_content", "on_post_page", "on_post_build"):
+        assert report["hooks"][hook]["calls"] >= 1
+    # pages without redoc tag are not scanned
+    assert report["hooks"]["on_post_page"]["calls"] > report["counts"]["pages_scanned"]
+    for stage in (
+        "scan",
+        "spec_source",
+        "render_template",
+        "write_files",
+        "sync_assets",
+    ):
+        assert stage in report["stages"]
+    assert report["counts"]["redoc_tags"] >= report["counts"]["pages_rewritten"] > 0
+    assert report["counts"]["iframes_written"] == len(
+        list((testproject_path / IFRAME_DIR).glob("redoc-*.html"))
+    )
+    assert report["counts"]["bytes_written"] > 0
+    assert len(report["slowest_pages"]) == 2
+    first, second = report["slowest_pages"]
+    assert first["seconds"] >= second["seconds"]
+
+
+def test_budget(tmp_path):
+    """
+    Validate the payload of each page is reported and checked against budgets
+    """
+    mkdocs_file = "mkdocs-budget.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    report = json.loads((testproject_path / "budget.json").read_text(encoding="utf8"))
+
+    page = report["pages"]["multiple.md"]
+    assert page["embeds"] == 3
+    js_file = testproject_path / "site/assets/javascripts/redoc.standalone.js"
+    assert page["bundle_bytes"] > js_file.stat().st_size
+    file = testproject_path / "site/multiple/index.html"
+    soup = BeautifulSoup(file.read_text(encoding="utf8"), "html.parser")
+    iframe_files = {
+        (file.parent / iframe["src"]).resolve()
+        for iframe in soup.find_all("iframe", class_="redoc-iframe")
+    }
+    assert page["document_bytes"] == sum(
+        iframe_file.stat().st_size for iframe_file in iframe_files
+    )
+    spec_file = testproject_path / "site/openapi-spec/sample.yaml"
+    assert page["specs"]["openapi-spec/sample.yaml"] == spec_file.stat().st_size
+    assert page["unknown"] == ["https://petstore.swagger.io/v2/swagger.json"]
+    assert page["total_bytes"] == (
+        page["bundle_bytes"] + page["document_bytes"] + page["spec_bytes"]
+    )
+    assert sorted(report["specs"]["openapi-spec/sample.yaml"]["pages"]) == [
+        "index.md",
+        "multiple.md",
+        "sub_dir/page_in_sub_dir.md",
+    ]
+
+    # pages and specs over budget fail a strict build
+    result = build_docs_setup(testproject_path, ["--strict"])
+    assert result.exit_code != 0
+    assert "Page 'multiple.md' has 3 Redoc embeds" in result.output
+    assert "Redoc spec 'openapi-spec/sample.yaml' is 2 KB" in result.output
+    assert "KB of Redoc" not in result.output
+
+
+def test_budget_embedded_spec(tmp_path):
+    """
+    Validate specs embedded into the iframe html are checked against the budget
+    """
+    mkdocs_file = "mkdocs-budget-embed.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert (
+        "Redoc spec 'openapi-spec/sample-oauth2.yaml' is 2 KB embedded" in result.output
+    )
+    report = json.loads((testproject_path / "budget.json").read_text(encoding="utf8"))
+
+    embedded = report["embedded_specs"]["openapi-spec/sample-oauth2.yaml"]
+    assert 1024 < embedded["bytes"] <= 1850
+    assert embedded["pages"] == ["multiple.md"]
+    page = report["pages"]["multiple.md"]
+    assert page["embedded_specs"] == {
+        "openapi-spec/sample-oauth2.yaml": embedded["bytes"]
+    }
+    # counted with the iframe html it is embedded into
+    assert "openapi-spec/sample-oauth2.yaml" not in page["specs"]
+
+
 def test_static(tmp_path):
     """
     Validate static files
@@ -405,6 +1285,234 @@ def test_static(tmp_path):
         assert (testproject_path / "site/assets/stylesheets/" / file_name).exists()
 
 
+def test_static_incremental(tmp_path):
+    """
+    Validate unchanged static files are not copied again
+    """
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    # a plain build has no use of the manifest, the cache isn't created for it
+    assert not (testproject_path / ".cache").exists()
+
+    # dirty builds keep it, out of the deployed site
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert read_manifest(testproject_path)["assets"]
+    assert not [
+        path for path in (testproject_path / "site").rglob("*") if "manifest" in path.name
+    ]
+    js_file = testproject_path / "site/assets/javascripts/redoc.standalone.js"
+    css_file = testproject_path / "site/assets/stylesheets/redark.css"
+    js_mtime = js_file.stat().st_mtime_ns
+
+    css_file.write_text("corrupted", encoding="utf8")
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert js_file.stat().st_mtime_ns == js_mtime
+    assert (
+        css_file.read_bytes()
+        == (
+            pathlib.Path(plugin.base_path) / "redoc/stylesheets/redark.css"
+        ).read_bytes()
+    )
+
+
+def test_static_hardlink(tmp_path):
+    """
+    Validate static files are linked instead of copied
+    """
+    mkdocs_file = "mkdocs-hardlink.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    js_file = testproject_path / "site/assets/javascripts/redoc.standalone.js"
+    src_file = pathlib.Path(plugin.base_path) / "redoc/javascripts/redoc.standalone.js"
+    assert js_file.read_bytes() == src_file.read_bytes()
+    if js_file.stat().st_dev == src_file.stat().st_dev:
+        assert js_file.samefile(src_file)
+
+
+def test_static_corrupted_copy(tmp_path, monkeypatch):
+    """
+    Validate a corrupted copy fails the build
+    """
+
+    def partial_copy(src_path, dest_path, mode):
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        pathlib.Path(dest_path).write_text("partial", encoding="utf8")
+
+    monkeypatch.setattr(assets, "install_file", partial_copy)
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code != 0
+    assert "is corrupted after copy" in result.output
+    assert not (testproject_path / "site/assets/stylesheets/redark.css").exists()
+
+
+def test_precompress(tmp_path):
+    """
+    Validate precompressed static files and iframe html
+    """
+    mkdocs_file = "mkdocs-precompress.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert re.search(r"Precompressed \d+ Redoc files", result.output)
+    compressed_files = [
+        testproject_path / "site/assets/javascripts/redoc.standalone.js",
+        testproject_path / "site/assets/stylesheets/redark.css",
+    ]
+    compressed_files.extend(
+        testproject_path / IFRAME_DIR / file_name
+        for file_name in os.listdir(testproject_path / IFRAME_DIR)
+        if file_name.endswith(".html")
+    )
+    for file in compressed_files:
+        gz_file = file.parent / (file.name + ".gz")
+        assert gzip.decompress(gz_file.read_bytes()) == file.read_bytes()
+        if assets.brotli is not None:
+            assert (file.parent / (file.name + ".br")).exists()
+
+    # unchanged files are not compressed again
+    gz_file = testproject_path / "site/assets/javascripts/redoc.standalone.js.gz"
+    gz_mtime = gz_file.stat().st_mtime_ns
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert gz_file.stat().st_mtime_ns == gz_mtime
+
+
+def test_fingerprint_assets(tmp_path):
+    """
+    Validate Redoc css and js files are named after their content
+    """
+    mkdocs_file = "mkdocs-fingerprint.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    site_path = testproject_path / "site"
+    asset_paths = json.loads(
+        (site_path / "assets/redoc-tag-assets.json").read_text(encoding="utf8")
+    )
+    js_path = asset_paths["assets/javascripts/redoc.standalone.js"]
+    assert re.fullmatch(
+        r"assets/javascripts/redoc\.standalone\.[0-9a-f]{8}\.js", js_path
+    )
+    assert (site_path / js_path).read_bytes() == (
+        pathlib.Path(plugin.base_path) / "redoc/javascripts/redoc.standalone.js"
+    ).read_bytes()
+    assert not (site_path / "assets/javascripts/redoc.standalone.js").exists()
+
+    file = site_path / "index.html"
+    iframe_content_list = validate_iframe(file.read_text(encoding="utf8"), file.parent)
+    assert iframe_content_list
+    for iframe_content in iframe_content_list:
+        for asset_path in (
+            "assets/stylesheets/redark.css",
+            "assets/javascripts/redark.js",
+            "assets/javascripts/redoc.standalone.js",
+        ):
+            url = posixpath.relpath(asset_paths[asset_path], "assets/redoc")
+            assert f'"{url}"' in iframe_content
+
+    # disabling it removes fingerprinted files on a dirty build
+    config_file = testproject_path / "mkdocs.yml"
+    config_file.write_text(
+        config_file.read_text(encoding="utf8").replace("true", "false"),
+        encoding="utf8",
+    )
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert not (site_path / js_path).exists()
+    assert not (site_path / "assets/redoc-tag-assets.json").exists()
+    assert (site_path / "assets/javascripts/redoc.standalone.js").exists()
+
+
+def read_service_worker_urls(site_path):
+    content = (site_path / "redoc-tag-sw.js").read_text(encoding="utf8")
+    return [
+        json.loads(re.search(rf"const {name} = (.*);", content).group(1))
+        for name in ("cache_name", "precache_urls", "spec_urls")
+    ]
+
+
+def test_service_worker(tmp_path):
+    """
+    Validate the service worker caches what the build emitted
+    """
+    mkdocs_file = "mkdocs-service-worker.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    site_path = testproject_path / "site"
+    cache_name, precache_urls, spec_urls = read_service_worker_urls(site_path)
+    assert "assets/javascripts/redoc.standalone.js" in precache_urls
+    assert "assets/stylesheets/redark.css" in precache_urls
+    iframe_urls = [url for url in precache_urls if url.endswith(".html")]
+    assert sorted(iframe_urls) == sorted(
+        f"assets/redoc/{file.name}"
+        for file in (testproject_path / IFRAME_DIR).glob("redoc-*.html")
+    )
+    for url in precache_urls + spec_urls:
+        assert (site_path / url).exists()
+    # with bundle_specs, pages load the bundled specs instead of the sources
+    assert "openapi-spec/sample.yaml" not in spec_urls
+    assert spec_urls == sorted(
+        f"assets/redoc/specs/{file.name}"
+        for file in (testproject_path / IFRAME_DIR / "specs").glob("*.json")
+    )
+
+    file = site_path / "multiple/index.html"
+    script_tag = find_page_script(file.read_text(encoding="utf8"))
+    assert (file.parent / script_tag["data-service-worker"]).resolve() == (
+        site_path / "redoc-tag-sw.js"
+    )
+
+    # pages not built again by a dirty build keep their iframes cached
+    result = build_docs_setup(testproject_path, ["--dirty"])
+    assert result.exit_code == 0, "'mkdocs build' command failed"
+    assert read_service_worker_urls(site_path) == [
+        cache_name,
+        precache_urls,
+        spec_urls,
+    ]
+
+
+def test_write_error(tmp_path, monkeypatch):
+    """
+    Validate a failed write of generated files fails the build
+    """
+
+    def write_file(path, content):
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(assets, "write_file", write_file)
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = setup_clean_mkdocs_folder(
+        mkdocs_yml_path=f"tests/fixtures/{mkdocs_file}", output_path=tmp_path
+    )
+    result = build_docs_setup(testproject_path)
+    assert result.exit_code != 0
+    assert "Can't write 3 Redoc files" in result.output
+
+
+def test_written_sizes(tmp_path):
+    """
+    Validate only the files actually written are counted
+    """
+    writer = assets.OutputWriter(str(tmp_path))
+    writer.add("specs/a.json", "{}", content_addressed=True)
+    writer.add("redoc-a.html", "<p>é</p>")
+    writer.flush()
+    assert writer.written_sizes == {"specs/a.json": 2, "redoc-a.html": 9}
+
+    # written by the previous build, and still there
+    writer = assets.OutputWriter(str(tmp_path), written=["specs/a.json"])
+    writer.add("specs/a.json", "{}", content_addressed=True)
+    writer.add("redoc-a.html", "<p>é</p>")
+    writer.flush()
+    assert writer.urls == {"specs/a.json", "redoc-a.html"}
+    assert writer.written_sizes == {"redoc-a.html": 9}
+
+
 def test_empty(tmp_path):
     """
     Validate static files
@@ -417,6 +1525,19 @@ def test_empty(tmp_path):
     validate_additional_script_code(contents, exists=True)
 
 
+def test_page_without_redoc_untouched(tmp_path):
+    """
+    Validate pages without redoc tag are not rewritten
+    """
+    mkdocs_file = "mkdocs.yml"
+    testproject_path = validate_mkdocs_file(tmp_path, f"tests/fixtures/{mkdocs_file}")
+    file = testproject_path / "site/empty/index.html"
+    contents = file.read_text(encoding="utf8")
+
+    assert "<script></script>" not in contents
+    assert contents.startswith("<!DOCTYPE html>")
+
+
 def test_error(tmp_path):
     mkdocs_file = "mkdocs-error.yml"
     validate_mkdocs_file(
@@ -436,3 +1557,21 @@ def test_template(tmp_path):
 
     iframe_content_list = validate_iframe(contents, file.parent)
     assert len(iframe_content_list) == 2
+
+
+def test_template_cache(tmp_path, monkeypatch):
+    """
+    Validate iframe template is compiled once and reloaded on change
+    """
+    shutil.copytree(os.path.join(plugin.base_path, "redoc"), tmp_path / "redoc")
+    monkeypatch.setattr(plugin, "base_path", str(tmp_path))
+    monkeypatch.setattr(plugin, "template_cache", {})
+
+    template = plugin.load_template("redoc.html")
+    assert plugin.load_template("redoc.html") is template
+
+    template_file = tmp_path / "redoc" / "redoc.html"
+    template_file.write_text("changed {{ id }}", encoding="utf8")
+    os.utime(template_file, ns=(0, 0))
+    template = plugin.load_template("redoc.html")
+    assert template.render(id="1") == "changed 1"
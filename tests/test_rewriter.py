@@ -0,0 +1,102 @@
+# other 3rd party
+from bs4 import BeautifulSoup
+
+# plugin
+from mkdocs_redoc_tag import rewriter
+
+SAMPLE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<script>var tag = "<redoc src='in-script.yaml'/>";</script>
+<style>redoc { display: none; }</style>
+</head>
+<body>
+<!-- <redoc src="in-comment.yaml"/> -->
+<p><redoc src="./openapi-spec/sample.yaml"/></p>
+<REDOC SRC="upper.yaml"></REDOC>
+<redoc src="ignored.yaml" src="a.yaml?x=1&amp;y=2">
+<p>after</p>
+</body>
+</html>
+"""
+
+
+def test_scan_parity_with_beautifulsoup():
+    """
+    Tags found by the rewriter are the ones BeautifulSoup finds
+    """
+    for content in (
+        SAMPLE_HTML,
+        # attributes not separated by whitespace
+        '<redoc src="a.yaml"height="1"/>',
+        # slash not directly followed by the end of the tag
+        '<redoc src="a" / >',
+        "<redoc / src=\"a\"/x='1' y=b/>",
+    ):
+        redoc_tags = rewriter.scan(content)
+        soup_tags = BeautifulSoup(content, "html.parser").find_all("redoc")
+
+        assert redoc_tags
+        assert [tag.attrs for tag in redoc_tags] == [tag.attrs for tag in soup_tags]
+
+
+def test_scan_spans():
+    redoc_tags = rewriter.scan(SAMPLE_HTML)
+    spans = [SAMPLE_HTML[tag.start : tag.end] for tag in redoc_tags]
+
+    assert spans == [
+        '<redoc src="./openapi-spec/sample.yaml"/>',
+        '<REDOC SRC="upper.yaml"></REDOC>',
+        '<redoc src="ignored.yaml" src="a.yaml?x=1&amp;y=2">',
+    ]
+
+
+def test_scan_nested_tags():
+    """
+    A redoc element nested into another one is replaced with it, as with
+    BeautifulSoup, and redoc elements never closed are the start tag alone
+    """
+    content = (
+        '<redoc src="outer.yaml"><redoc src="inner.yaml"/>'
+        '<redoc src="deep.yaml"></redoc></redoc>'
+        '<p><redoc src="unclosed.yaml"></p>'
+        '<redoc src="after.yaml"></redoc>'
+    )
+    redoc_tags = rewriter.scan(content)
+    soup_tags = BeautifulSoup(content, "html.parser").find_all("redoc")
+    assert [tag.attrs for tag in redoc_tags] == [
+        tag.attrs for tag in soup_tags if tag.find_parent("redoc") is None
+    ]
+
+    output = rewriter.splice(
+        content, [(tag.start, tag.end, "<iframe></iframe>") for tag in redoc_tags]
+    )
+    assert output == "<iframe></iframe><p><iframe></iframe></p><iframe></iframe>"
+
+
+def test_scan_unterminated_tag():
+    # the attribute list is not backtracked into when the tag is never ended
+    assert rewriter.scan('<redoc ' + 'a"' * 40) == []
+
+
+def test_splice_keeps_untouched_content():
+    redoc_tags = rewriter.scan(SAMPLE_HTML)
+    replacements = [(tag.start, tag.end, "<iframe></iframe>") for tag in redoc_tags]
+    body_end = SAMPLE_HTML.index("</body>")
+    replacements.append((body_end, body_end, "<script></script>"))
+    output = rewriter.splice(SAMPLE_HTML, replacements)
+
+    assert output.count("<iframe></iframe>") == 3
+    assert '<!-- <redoc src="in-comment.yaml"/> -->' in output
+    assert "<script></script></body>" in output
+    assert rewriter.splice(SAMPLE_HTML, []) == SAMPLE_HTML
+
+
+def test_build_tag_parity_with_beautifulsoup():
+    attrs = {"id": "1", "src": "a.html?x=1&y=2", "class": "redoc-iframe"}
+    soup = BeautifulSoup("", "html.parser")
+    tag = soup.new_tag("iframe")
+    for key, val in attrs.items():
+        tag[key] = val
+
+    assert rewriter.build_tag("iframe", attrs) == str(tag)
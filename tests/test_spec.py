@@ -0,0 +1,183 @@
+# standard lib
+import json
+
+# other 3rd party
+import pytest
+
+# plugin
+from mkdocs_redoc_tag import spec
+
+BUNDLE_SPEC = "tests/fixtures/bundle_docs/openapi-spec/openapi.yaml"
+
+
+def iter_refs(node):
+    if isinstance(node, dict):
+        for key, val in node.items():
+            if key == "$ref":
+                yield val
+            else:
+                yield from iter_refs(val)
+    elif isinstance(node, list):
+        for val in node:
+            yield from iter_refs(val)
+
+
+def test_bundle():
+    """
+    Validate all relative $ref are resolved into one document
+    """
+    bundled, files = spec.bundle(BUNDLE_SPEC)
+
+    assert len(files) == 6
+    for ref in iter_refs(bundled):
+        assert ref.startswith("#/")
+        # every internal $ref can be resolved
+        spec.resolve_pointer(bundled, ref[1:], BUNDLE_SPEC)
+
+    pet = bundled["components"]["schemas"]["Pet"]
+    assert pet["properties"]["children"]["items"] == {
+        "$ref": "#/components/schemas/Pet"
+    }
+    # timestamps are kept as they are written
+    assert bundled["info"]["x-released"] == "2024-01-21"
+    assert json.loads(spec.dumps(bundled)) == json.loads(json.dumps(bundled))
+
+
+def test_bundle_single_file():
+    bundled, files = spec.bundle("tests/fixtures/docs/openapi-spec/sample.yaml")
+
+    assert len(files) == 1
+    assert bundled == spec.load_file("tests/fixtures/docs/openapi-spec/sample.yaml")
+
+
+def test_bundle_core_schema(tmp_path):
+    """
+    Validate scalars are read with the YAML 1.2 core schema, as Redoc does
+    """
+    spec_file = tmp_path / "openapi.yaml"
+    spec_file.write_text(
+        'openapi: "3.0.0"\n'
+        "components:\n"
+        "  schemas:\n"
+        "    Switch:\n"
+        "      enum: [on, off, yes, no, true, False, null]\n"
+        "    Mode:\n"
+        "      example: 0755\n"
+        "      x-octal: 0o755\n"
+        "      x-hex: 0x1F\n"
+        "      x-numbers: [0, -12, 1.5, 1e3, .inf]\n"
+        "    Duration:\n"
+        "      example: 1:30\n",
+        encoding="utf8",
+    )
+    bundled, _ = spec.bundle(str(spec_file))
+
+    schemas = bundled["components"]["schemas"]
+    assert schemas["Switch"]["enum"] == ["on", "off", "yes", "no", True, False, None]
+    assert schemas["Mode"]["example"] == "0755"
+    assert schemas["Mode"]["x-octal"] == 0o755
+    assert schemas["Mode"]["x-hex"] == 31
+    assert schemas["Mode"]["x-numbers"] == [0, -12, 1.5, 1000.0, float("inf")]
+    assert schemas["Duration"]["example"] == "1:30"
+
+
+def test_bundle_error(tmp_path):
+    spec_file = tmp_path / "openapi.yaml"
+    spec_file.write_text(
+        'openapi: "3.0.0"\ncomponents:\n  schemas:\n    Pet:\n      $ref: "./missing.yaml"\n',
+        encoding="utf8",
+    )
+    with pytest.raises(spec.SpecError, match="missing.yaml"):
+        spec.bundle(str(spec_file))
+
+    spec_file.write_text("title: not a spec\n", encoding="utf8")
+    with pytest.raises(spec.SpecError, match="not an OpenAPI Specification"):
+        spec.bundle(str(spec_file))
+
+
+def test_prune():
+    """
+    Validate only selected operations and the components they reference are kept
+    """
+    bundled, _ = spec.bundle(BUNDLE_SPEC)
+
+    pruned = spec.prune(bundled, include={"operations": ["showPetById"]})
+    assert list(pruned["paths"]) == ["/pets/{petId}"]
+    assert sorted(pruned["components"]["schemas"]) == ["Error", "Pet"]
+    for ref in iter_refs(pruned):
+        spec.resolve_pointer(pruned, ref[1:], BUNDLE_SPEC)
+
+    pruned = spec.prune(bundled, exclude={"tags": ["pets"]})
+    assert list(pruned["paths"]) == ["/store/orders"]
+    assert [tag["name"] for tag in pruned["tags"]] == ["store"]
+    for ref in iter_refs(pruned):
+        spec.resolve_pointer(pruned, ref[1:], BUNDLE_SPEC)
+
+    # the bundled spec is left as it is
+    assert spec.prune(bundled) == bundled
+    assert len(bundled["paths"]) == 3
+
+
+def test_prune_swagger():
+    swagger = {
+        "swagger": "2.0",
+        "paths": {
+            "/a": {
+                "get": {
+                    "operationId": "a",
+                    "responses": {"200": {"$ref": "#/responses/A"}},
+                }
+            },
+            "/b": {
+                "get": {
+                    "operationId": "b",
+                    "responses": {"200": {"$ref": "#/responses/B"}},
+                }
+            },
+        },
+        "responses": {
+            "A": {"description": "a", "schema": {"$ref": "#/definitions/Item"}},
+            "B": {"description": "b"},
+        },
+        "definitions": {"Item": {"type": "object"}, "Unused": {"type": "string"}},
+    }
+    pruned = spec.prune(swagger, include={"paths": ["/a"]})
+    assert list(pruned["paths"]) == ["/a"]
+    assert list(pruned["responses"]) == ["A"]
+    assert list(pruned["definitions"]) == ["Item"]
+
+
+def test_operations():
+    """
+    Validate operations are listed with their method, path, id and tags
+    """
+    bundled, _ = spec.bundle(BUNDLE_SPEC)
+    operations = spec.operations(bundled)
+
+    assert operations
+    for operation in operations:
+        assert operation["method"] in spec.HTTP_METHODS
+        assert bundled["paths"][operation["path"]][operation["method"]]
+        assert isinstance(operation["tags"], list)
+    assert spec.operations({"paths": {"/empty": {"parameters": []}}}) == []
+
+
+def test_references(tmp_path):
+    """
+    Validate the files of a spec are found without bundling it
+    """
+    assert spec.references(BUNDLE_SPEC) == spec.bundle(BUNDLE_SPEC)[1]
+
+    spec_file = tmp_path / "openapi.yaml"
+    spec_file.write_text(
+        "openapi: 3.0.3\n"
+        "components:\n"
+        "  schemas:\n"
+        "    Pet: {$ref: 'missing.yaml'}\n"
+        "    Remote: {$ref: 'https://example.com/pet.yaml'}\n",
+        encoding="utf8",
+    )
+    assert spec.references(str(spec_file)) == {
+        str(spec_file),
+        str(tmp_path / "missing.yaml"),
+    }